@@ -12,6 +12,7 @@ Requirements:
 - OBS Studio 28.0 or later
 - Moondream API key (get one at https://moondream.ai)
 - Webcam connected to your computer
+- Optional: Pillow in OBS's Python for JPEG frames (a downscaled PNG is sent otherwise)
 
 Web Demo: https://streamgeeks.github.io/visual-reasoning-playground/03-gesture-obs/
 GitHub: https://github.com/streamgeeks/visual-reasoning-playground
@@ -21,13 +22,21 @@ License: MIT
 """
 
 import obspython as obs
-import urllib.request
-import urllib.error
+import urllib.parse
 import base64
+import ctypes
+import ctypes.util
+import http.client
+import io
 import json
+import random
+import re
+import struct
 import time
-import os
-import tempfile
+import threading
+import zlib
+from collections import deque, namedtuple
+from email.utils import parsedate_to_datetime
 
 # =============================================================================
 # Global Settings
@@ -35,10 +44,25 @@ import tempfile
 
 settings_data = {
     "api_key": "",
+    "api_base_url": "https://api.moondream.ai/v1",
     "source_name": "",
     "thumbs_up_scene": "",
     "thumbs_down_scene": "",
+    "extra_gestures": [],
     "detection_interval": 2000,
+    "max_calls_per_minute": 60,
+    "max_in_flight": 2,
+    "stream_answers": True,
+    "capture_width": 640,
+    "jpeg_quality": 80,
+    "roi_mode": "full",
+    "roi_left": 0,
+    "roi_top": 0,
+    "roi_width": 100,
+    "roi_height": 100,
+    "quality_ladder": True,
+    "change_threshold": 2,
+    "hash_distance": 4,
     "cooldown_seconds": 3,
     "enabled": False,
     "debug_mode": False
@@ -46,10 +70,15 @@ settings_data = {
 
 # State tracking
 last_action_time = 0
-thumbs_up_count = 0
-thumbs_down_count = 0
+candidate_gesture = None
+candidate_count = 0
 DEBOUNCE_REQUIRED = 2
 
+# Background worker (see "Background Worker" below)
+ACTION_POLL_MS = 100
+worker = None
+pending_scenes = deque()
+
 # =============================================================================
 # Script Info (shown in OBS Scripts window)
 # =============================================================================
@@ -62,6 +91,7 @@ def script_description():
 <ul>
 <li>👍 <b>Thumbs Up</b> → Switch to Scene A</li>
 <li>👎 <b>Thumbs Down</b> → Switch to Scene B</li>
+<li>✌️ Any other gesture you add as <code>gesture = Scene</code>, e.g. <code>peace sign = Slides</code></li>
 </ul>
 
 <h3>Setup:</h3>
@@ -72,6 +102,9 @@ def script_description():
 <li>Enable detection and start gesturing!</li>
 </ol>
 
+<p><i>Frames are encoded as JPEG with Pillow. If OBS's Python does not have
+Pillow, frames are sent as downscaled PNGs instead, which upload more slowly.</i></p>
+
 <p><a href="https://streamgeeks.github.io/visual-reasoning-playground/03-gesture-obs/">Try the Web Demo</a> | 
 <a href="https://github.com/streamgeeks/visual-reasoning-playground">GitHub</a></p>
 """
@@ -85,6 +118,7 @@ def script_properties():
     
     # API Key
     obs.obs_properties_add_text(props, "api_key", "Moondream API Key", obs.OBS_TEXT_PASSWORD)
+    obs.obs_properties_add_text(props, "api_base_url", "API Base URL", obs.OBS_TEXT_DEFAULT)
     
     # Video Source Selection
     source_list = obs.obs_properties_add_list(
@@ -124,11 +158,53 @@ def script_properties():
             obs.obs_property_list_add_string(thumbs_down_list, name, name)
         obs.source_list_release(scenes)
     
+    obs.obs_properties_add_editable_list(
+        props, "extra_gestures", "More Gestures (gesture = Scene)",
+        obs.OBS_EDITABLE_LIST_TYPE_STRINGS, None, None
+    )
+    
     # Detection Settings
     obs.obs_properties_add_int_slider(
-        props, "detection_interval", "Detection Interval (ms)",
+        props, "detection_interval", "Detection Interval When Idle (ms)",
         1000, 5000, 500
     )
+    obs.obs_properties_add_int_slider(
+        props, "max_calls_per_minute", "API Budget (calls per minute)",
+        10, 300, 10
+    )
+    obs.obs_properties_add_int_slider(
+        props, "max_in_flight", "Requests in Flight",
+        1, 4, 1
+    )
+    obs.obs_properties_add_bool(props, "stream_answers", "⚡ Act on the first words of the answer (streaming)")
+    obs.obs_properties_add_int_slider(
+        props, "capture_width", "Capture Width (px)",
+        320, 1280, 32
+    )
+    obs.obs_properties_add_int_slider(
+        props, "jpeg_quality", "JPEG Quality",
+        30, 95, 5
+    )
+    roi_list = obs.obs_properties_add_list(
+        props, "roi_mode", "Region Sent to the API",
+        obs.OBS_COMBO_TYPE_LIST, obs.OBS_COMBO_FORMAT_STRING
+    )
+    obs.obs_property_list_add_string(roi_list, "Full frame", ROI_FULL)
+    obs.obs_property_list_add_string(roi_list, "Fixed region (below)", ROI_FIXED)
+    obs.obs_property_list_add_string(roi_list, "Follow the detected hand", ROI_FOLLOW)
+    for key, label in [("roi_left", "Region Left (%)"), ("roi_top", "Region Top (%)"),
+                       ("roi_width", "Region Width (%)"), ("roi_height", "Region Height (%)")]:
+        obs.obs_properties_add_int_slider(props, key, label, 0, 100, 1)
+    obs.obs_properties_add_bool(props, "quality_ladder", "📉 Send the smallest image that still works")
+    
+    obs.obs_properties_add_int_slider(
+        props, "change_threshold", "Skip Unchanged Frames: Brightness Change (0 = off)",
+        0, 20, 1
+    )
+    obs.obs_properties_add_int_slider(
+        props, "hash_distance", "Skip Unchanged Frames: Hash Distance (bits)",
+        0, 16, 1
+    )
     obs.obs_properties_add_int_slider(
         props, "cooldown_seconds", "Cooldown Between Actions (sec)",
         1, 10, 1
@@ -141,7 +217,19 @@ def script_properties():
     return props
 
 def script_defaults(settings):
+    obs.obs_data_set_default_string(settings, "api_base_url", DEFAULT_API_BASE_URL)
     obs.obs_data_set_default_int(settings, "detection_interval", 2000)
+    obs.obs_data_set_default_int(settings, "max_calls_per_minute", 60)
+    obs.obs_data_set_default_int(settings, "max_in_flight", 2)
+    obs.obs_data_set_default_bool(settings, "stream_answers", True)
+    obs.obs_data_set_default_int(settings, "capture_width", 640)
+    obs.obs_data_set_default_int(settings, "jpeg_quality", 80)
+    obs.obs_data_set_default_string(settings, "roi_mode", ROI_FULL)
+    obs.obs_data_set_default_int(settings, "roi_width", 100)
+    obs.obs_data_set_default_int(settings, "roi_height", 100)
+    obs.obs_data_set_default_bool(settings, "quality_ladder", True)
+    obs.obs_data_set_default_int(settings, "change_threshold", 2)
+    obs.obs_data_set_default_int(settings, "hash_distance", 4)
     obs.obs_data_set_default_int(settings, "cooldown_seconds", 3)
     obs.obs_data_set_default_bool(settings, "enabled", False)
     obs.obs_data_set_default_bool(settings, "debug_mode", False)
@@ -150,27 +238,56 @@ def script_update(settings):
     global settings_data
     
     settings_data["api_key"] = obs.obs_data_get_string(settings, "api_key")
+    settings_data["api_base_url"] = obs.obs_data_get_string(settings, "api_base_url")
     settings_data["source_name"] = obs.obs_data_get_string(settings, "source_name")
     settings_data["thumbs_up_scene"] = obs.obs_data_get_string(settings, "thumbs_up_scene")
     settings_data["thumbs_down_scene"] = obs.obs_data_get_string(settings, "thumbs_down_scene")
+    settings_data["extra_gestures"] = read_string_list(settings, "extra_gestures")
     settings_data["detection_interval"] = obs.obs_data_get_int(settings, "detection_interval")
+    settings_data["max_calls_per_minute"] = obs.obs_data_get_int(settings, "max_calls_per_minute")
+    settings_data["max_in_flight"] = obs.obs_data_get_int(settings, "max_in_flight")
+    settings_data["stream_answers"] = obs.obs_data_get_bool(settings, "stream_answers")
+    settings_data["capture_width"] = obs.obs_data_get_int(settings, "capture_width")
+    settings_data["jpeg_quality"] = obs.obs_data_get_int(settings, "jpeg_quality")
+    settings_data["roi_mode"] = obs.obs_data_get_string(settings, "roi_mode")
+    for key in ("roi_left", "roi_top", "roi_width", "roi_height"):
+        settings_data[key] = obs.obs_data_get_int(settings, key)
+    settings_data["quality_ladder"] = obs.obs_data_get_bool(settings, "quality_ladder")
+    settings_data["change_threshold"] = obs.obs_data_get_int(settings, "change_threshold")
+    settings_data["hash_distance"] = obs.obs_data_get_int(settings, "hash_distance")
     settings_data["cooldown_seconds"] = obs.obs_data_get_int(settings, "cooldown_seconds")
     settings_data["enabled"] = obs.obs_data_get_bool(settings, "enabled")
     settings_data["debug_mode"] = obs.obs_data_get_bool(settings, "debug_mode")
     
-    # Restart timer with new interval
-    obs.timer_remove(detection_callback)
+    global gesture_registry
+    gesture_registry = build_registry()
     
-    if settings_data["enabled"] and settings_data["api_key"] and settings_data["source_name"]:
-        obs.timer_add(detection_callback, settings_data["detection_interval"])
+    # Restart the worker so it picks up the new settings
+    stop_worker()
+    
+    if settings_data["enabled"] and settings_data["api_key"] and settings_data["source_name"] \
+            and gesture_registry:
+        start_worker()
         log_debug("Gesture detection ENABLED")
     else:
         log_debug("Gesture detection DISABLED")
 
 def script_unload():
-    obs.timer_remove(detection_callback)
+    stop_worker(timeout=1.0)
     log_debug("Script unloaded")
 
+def read_string_list(settings, name):
+    """Values of an editable string list property"""
+    values = []
+    array = obs.obs_data_get_array(settings, name)
+    if array:
+        for i in range(obs.obs_data_array_count(array)):
+            item = obs.obs_data_array_item(array, i)
+            values.append(obs.obs_data_get_string(item, "value"))
+            obs.obs_data_release(item)
+        obs.obs_data_array_release(array)
+    return values
+
 # =============================================================================
 # Logging
 # =============================================================================
@@ -183,11 +300,111 @@ def log_info(message):
     print(f"[Moondream Gesture] {message}")
 
 # =============================================================================
-# Screenshot Capture
+# Frame Capture (in memory)
 # =============================================================================
+# The source is rendered into a texture at the configured capture width (the
+# GPU does the scaling), staged to system memory and copied out as RGBA. No
+# temp file and no sleep. gs_stagesurface_map takes an out-pointer, which the
+# obspython bindings cannot express, so that one call goes through ctypes.
 
-def capture_source_frame():
-    """Capture a frame from the selected OBS source and return as base64"""
+Frame = namedtuple("Frame", "width height pixels")  # pixels: RGBA bytes
+
+def load_libobs():
+    names = [ctypes.util.find_library("obs"), "obs", "libobs.so.0", "libobs.0.dylib"]
+    for name in names:
+        if not name:
+            continue
+        try:
+            lib = ctypes.CDLL(name)
+            lib.gs_stagesurface_map.argtypes = [
+                ctypes.c_void_p, ctypes.POINTER(ctypes.c_void_p), ctypes.POINTER(ctypes.c_uint32)]
+            lib.gs_stagesurface_map.restype = ctypes.c_bool
+            lib.gs_stagesurface_unmap.argtypes = [ctypes.c_void_p]
+            lib.gs_stagesurface_unmap.restype = None
+            return lib
+        except (OSError, AttributeError):
+            continue
+    return None
+
+class FrameGrabber:
+    """Reusable texrender + stage surface for reading a source's pixels"""
+    
+    def __init__(self):
+        self.libobs = None
+        self.texrender = None
+        self.stagesurf = None
+        self.size = (0, 0)
+    
+    def grab(self, source, max_width):
+        src_w = obs.obs_source_get_width(source)
+        src_h = obs.obs_source_get_height(source)
+        if not src_w or not src_h:
+            return None
+        width = min(max_width, src_w)
+        height = max(1, round(src_h * width / src_w))
+        
+        if self.libobs is None:
+            self.libobs = load_libobs()
+            if self.libobs is None:
+                log_info("Could not load libobs for frame capture")
+                return None
+        
+        obs.obs_enter_graphics()
+        try:
+            if self.texrender is None:
+                self.texrender = obs.gs_texrender_create(obs.GS_RGBA, obs.GS_ZS_NONE)
+            if self.size != (width, height):
+                if self.stagesurf is not None:
+                    obs.gs_stagesurface_destroy(self.stagesurf)
+                self.stagesurf = obs.gs_stagesurface_create(width, height, obs.GS_RGBA)
+                self.size = (width, height)
+            
+            obs.gs_texrender_reset(self.texrender)
+            if not obs.gs_texrender_begin(self.texrender, width, height):
+                return None
+            clear = obs.vec4()
+            obs.vec4_zero(clear)
+            obs.gs_clear(obs.GS_CLEAR_COLOR, clear, 0.0, 0)
+            obs.gs_ortho(0.0, float(src_w), 0.0, float(src_h), -100.0, 100.0)
+            obs.gs_blend_state_push()
+            obs.gs_blend_function(obs.GS_BLEND_ONE, obs.GS_BLEND_ZERO)
+            obs.obs_source_video_render(source)
+            obs.gs_blend_state_pop()
+            obs.gs_texrender_end(self.texrender)
+            obs.gs_stage_texture(self.stagesurf, obs.gs_texrender_get_texture(self.texrender))
+            
+            surface = ctypes.c_void_p(int(self.stagesurf))
+            data = ctypes.c_void_p()
+            linesize = ctypes.c_uint32()
+            if not self.libobs.gs_stagesurface_map(surface, ctypes.byref(data), ctypes.byref(linesize)):
+                return None
+            try:
+                row = width * 4
+                if linesize.value == row:
+                    pixels = ctypes.string_at(data.value, row * height)
+                else:
+                    pixels = b"".join(ctypes.string_at(data.value + y * linesize.value, row)
+                                      for y in range(height))
+            finally:
+                self.libobs.gs_stagesurface_unmap(surface)
+            return Frame(width, height, pixels)
+        finally:
+            obs.obs_leave_graphics()
+    
+    def release(self):
+        if self.texrender is None and self.stagesurf is None:
+            return
+        obs.obs_enter_graphics()
+        if self.stagesurf is not None:
+            obs.gs_stagesurface_destroy(self.stagesurf)
+        if self.texrender is not None:
+            obs.gs_texrender_destroy(self.texrender)
+        obs.obs_leave_graphics()
+        self.texrender = self.stagesurf = None
+        self.size = (0, 0)
+
+def capture_source_frame(grabber):
+    """Capture a frame from the selected OBS source as a Frame"""
     source_name = settings_data["source_name"]
     if not source_name:
         return None
@@ -197,80 +414,664 @@ def capture_source_frame():
         log_debug(f"Source not found: {source_name}")
         return None
     
-    # Create a temporary file for the screenshot
-    temp_dir = tempfile.gettempdir()
-    temp_path = os.path.join(temp_dir, "moondream_gesture_frame.jpg")
-    
     try:
-        # Use OBS screenshot functionality (OBS 28+)
-        # Note: This saves synchronously which may cause brief stutters
-        obs.obs_source_save_screenshot(source, "jpg", temp_path, 640, 480)
-        
-        # Small delay to ensure file is written
-        time.sleep(0.05)
-        
-        # Read and encode the image
-        if os.path.exists(temp_path):
-            with open(temp_path, "rb") as f:
-                image_data = f.read()
-            
-            # Clean up temp file
-            try:
-                os.remove(temp_path)
-            except:
-                pass
-            
-            return base64.b64encode(image_data).decode("utf-8")
+        return grabber.grab(source, settings_data["capture_width"])
     except Exception as e:
-        log_debug(f"Screenshot error: {e}")
+        log_debug(f"Capture error: {e}")
     finally:
         obs.obs_source_release(source)
     
     return None
 
+# =============================================================================
+# Frame Encoding
+# =============================================================================
+# Frames are sent as JPEG, encoded in memory by Pillow. OBS's Python often
+# lacks Pillow; then the frame is downscaled to PNG_FALLBACK_WIDTH and sent as
+# an RGB PNG (zlib only), which is larger per pixel and ignores the JPEG
+# quality, so starting detection warns about it.
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PNG_FALLBACK_WIDTH = 320
+
+def encode_png(frame):
+    rgb = bytearray(frame.width * frame.height * 3)
+    rgb[0::3], rgb[1::3], rgb[2::3] = frame.pixels[0::4], frame.pixels[1::4], frame.pixels[2::4]
+    row = frame.width * 3
+    raw = b"".join(b"\x00" + rgb[y * row:(y + 1) * row] for y in range(frame.height))
+    
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+    
+    header = struct.pack(">IIBBBBB", frame.width, frame.height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b""))
+
+def encode_frame(frame, quality=None):
+    """Encode a Frame as a JPEG data URL at `quality` (default: jpeg_quality),
+    or as a downscaled PNG data URL without Pillow"""
+    if Image is None:
+        data = encode_png(scale_frame(frame, PNG_FALLBACK_WIDTH))
+        return f"data:image/png;base64,{base64.b64encode(data).decode('ascii')}"
+    image = Image.frombuffer("RGBA", (frame.width, frame.height), frame.pixels, "raw", "RGBA", 0, 1)
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=quality or settings_data["jpeg_quality"])
+    return f"data:image/jpeg;base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+# =============================================================================
+# Region of Interest & Quality Ladder
+# =============================================================================
+# Uplink time dominates on venue networks, so the frame is cropped and scaled
+# before it is encoded. The region is the fixed rectangle from the script
+# properties or, in follow mode, the padded box of the gesture that started
+# the current debounce (one /detect call per new candidate). The quality
+# ladder starts at the smallest rung, steps up whenever a candidate fails to
+# confirm (a sign the picture was too coarse) and back down after
+# LADDER_STEP_DOWN_AFTER calls without one.
+
+ROI_FULL, ROI_FIXED, ROI_FOLLOW = "full", "fixed", "follow"
+ROI_PADDING = 0.5           # of the box size, on every side
+LADDER = [(0.4, 60), (0.6, 70), (0.8, 75), (1.0, None)]   # (scale, JPEG quality); None = setting
+LADDER_STEP_DOWN_AFTER = 20
+MIN_UPLOAD_WIDTH = 160
+
+def crop_frame(frame, box):
+    """Crop a Frame to a normalized (x0, y0, x1, y1) box"""
+    x0, x1 = int(box[0] * frame.width), max(int(box[2] * frame.width), int(box[0] * frame.width) + 1)
+    y0, y1 = int(box[1] * frame.height), max(int(box[3] * frame.height), int(box[1] * frame.height) + 1)
+    if (x0, y0, x1, y1) == (0, 0, frame.width, frame.height):
+        return frame
+    row = frame.width * 4
+    pixels = b"".join(frame.pixels[y * row + x0 * 4:y * row + x1 * 4] for y in range(y0, y1))
+    return Frame(x1 - x0, y1 - y0, pixels)
+
+def scale_frame(frame, width):
+    """Downscale a Frame to `width` (bilinear with Pillow, else nearest)"""
+    if width >= frame.width:
+        return frame
+    height = max(1, round(frame.height * width / frame.width))
+    if Image is not None:
+        image = Image.frombuffer("RGBA", (frame.width, frame.height), frame.pixels, "raw", "RGBA", 0, 1)
+        return Frame(width, height, image.resize((width, height), Image.BILINEAR).tobytes())
+    row = frame.width * 4
+    columns = [(x * frame.width // width) * 4 for x in range(width)]
+    pixels = bytearray()
+    for y in range(height):
+        start = (y * frame.height // height) * row
+        source = frame.pixels[start:start + row]
+        pixels += b"".join(source[c:c + 4] for c in columns)
+    return Frame(width, height, bytes(pixels))
+
+def clamp_box(x0, y0, x1, y1):
+    return (max(0.0, x0), max(0.0, y0), min(1.0, x1), min(1.0, y1))
+
+def fixed_region():
+    if settings_data["roi_mode"] == ROI_FULL:
+        return (0.0, 0.0, 1.0, 1.0)
+    left, top = settings_data["roi_left"] / 100.0, settings_data["roi_top"] / 100.0
+    box = clamp_box(left, top, left + settings_data["roi_width"] / 100.0,
+                    top + settings_data["roi_height"] / 100.0)
+    if box[2] - box[0] < 0.05 or box[3] - box[1] < 0.05:
+        return (0.0, 0.0, 1.0, 1.0)
+    return box
+
+class UploadShaper:
+    """Crops and scales frames before upload and learns how small they can be"""
+    
+    def __init__(self):
+        self.follow_box = None
+        self.level = 0
+        self.streak = 0
+        self.calls = 0
+        self.bytes_sent = 0
+    
+    def region(self):
+        return self.follow_box or fixed_region()
+    
+    def prepare(self, frame):
+        """(image_url, region) for a captured Frame"""
+        region = self.region()
+        cropped = crop_frame(frame, region)
+        scale, quality = LADDER[self.level] if settings_data["quality_ladder"] else LADDER[-1]
+        width = max(MIN_UPLOAD_WIDTH, int(cropped.width * scale))
+        upload = scale_frame(cropped, width)
+        image_url = encode_frame(upload, quality)
+        
+        self.calls += 1
+        self.bytes_sent += len(image_url)
+        log_debug(f"Upload {len(image_url)} bytes ({upload.width}x{upload.height}, "
+                  f"rung {self.level + 1}/{len(LADDER)}, region {tuple(round(v, 2) for v in region)}), "
+                  f"average {self.bytes_sent // self.calls} bytes/call")
+        return image_url, region
+    
+    def follow(self, client, image_url, region, gesture):
+        """Remember the padded box of `gesture` for the following frames"""
+        try:
+            result = client.post("/detect", {
+                "image_url": image_url,
+                "object": f"hand making a {gesture.name} gesture",
+                "stream": False
+            })
+        except MoondreamError as e:
+            log_debug(f"Region lookup failed: {e}")
+            return
+        objects = result.get("objects") or []
+        if not objects:
+            return
+        box = objects[0]
+        # detection coordinates are relative to the uploaded region
+        rx, ry = region[0], region[1]
+        rw, rh = region[2] - region[0], region[3] - region[1]
+        x0, y0 = rx + box["x_min"] * rw, ry + box["y_min"] * rh
+        x1, y1 = rx + box["x_max"] * rw, ry + box["y_max"] * rh
+        pad_x, pad_y = (x1 - x0) * ROI_PADDING, (y1 - y0) * ROI_PADDING
+        self.follow_box = clamp_box(x0 - pad_x, y0 - pad_y, x1 + pad_x, y1 + pad_y)
+    
+    def unfollow(self):
+        self.follow_box = None
+    
+    def confirmation_failed(self):
+        self.streak = 0
+        if settings_data["quality_ladder"] and self.level < len(LADDER) - 1:
+            self.level += 1
+            log_debug(f"Quality ladder up to rung {self.level + 1}")
+    
+    def succeeded(self):
+        self.streak += 1
+        if self.streak >= LADDER_STEP_DOWN_AFTER and self.level > 0:
+            self.level -= 1
+            self.streak = 0
+            log_debug(f"Quality ladder down to rung {self.level + 1}")
+
+# =============================================================================
+# Change Detection
+# =============================================================================
+# Before a frame is encoded and sent, it is reduced to a 32x24 grayscale
+# thumbnail (green channel, block averages) and a 64-bit difference hash.
+# If both are close to those of the frame behind the last successful API
+# result, the presenter has not moved and that result still stands, so the
+# call is skipped and the result is counted again. A gesture waiting for debounce confirmation is always re-checked,
+# and a fresh call is forced every MAX_REUSE_SECONDS regardless.
+
+THUMB_SIZE = (32, 24)
+ROWS_PER_CELL = 4
+MAX_REUSE_SECONDS = 30
+
+def frame_thumbnail(frame):
+    """Block-averaged green channel of a Frame as a THUMB_SIZE list"""
+    cols, rows = THUMB_SIZE
+    row_bytes = frame.width * 4
+    cell_w = max(1, frame.width // cols)
+    band = frame.height / rows
+    thumb = []
+    for r in range(rows):
+        sums = [0] * cols
+        for k in range(ROWS_PER_CELL):
+            y = min(frame.height - 1, int((r + (k + 0.5) / ROWS_PER_CELL) * band))
+            green = frame.pixels[y * row_bytes + 1:(y + 1) * row_bytes:4]
+            for c in range(cols):
+                sums[c] += sum(green[c * cell_w:(c + 1) * cell_w])
+        thumb.extend(s / (ROWS_PER_CELL * cell_w) for s in sums)
+    return thumb
+
+def difference_hash(thumb):
+    """64-bit dHash: 9x8 block means of the thumbnail, compared left to right"""
+    cols, rows = THUMB_SIZE
+    grid = []
+    for gy in range(8):
+        y0, y1 = gy * rows // 8, (gy + 1) * rows // 8
+        for gx in range(9):
+            x0, x1 = gx * cols // 9, (gx + 1) * cols // 9
+            cells = [thumb[y * cols + x] for y in range(y0, y1) for x in range(x0, x1)]
+            grid.append(sum(cells) / len(cells))
+    bits = 0
+    for gy in range(8):
+        for gx in range(8):
+            bits = (bits << 1) | (grid[gy * 9 + gx] < grid[gy * 9 + gx + 1])
+    return bits
+
+class ChangeGate:
+    """Decides whether a frame differs enough from the last one classified"""
+    
+    def __init__(self):
+        self.reference = None
+        self.result = None
+        self.recorded_at = 0.0
+        self.saved = 0
+    
+    def signature(self, frame):
+        thumb = frame_thumbnail(frame)
+        return thumb, difference_hash(thumb)
+    
+    def unchanged(self, signature):
+        threshold = settings_data["change_threshold"]
+        if not threshold or self.reference is None:
+            return False
+        if time.monotonic() - self.recorded_at > MAX_REUSE_SECONDS:
+            return False
+        thumb, bits = signature
+        ref_thumb, ref_bits = self.reference
+        diff = sum(abs(a - b) for a, b in zip(thumb, ref_thumb)) / len(thumb)
+        distance = bin(bits ^ ref_bits).count("1")
+        return diff < threshold and distance <= settings_data["hash_distance"]
+    
+    def record(self, signature, result):
+        """Remember a frame that was classified successfully and its result"""
+        self.reference = signature
+        self.result = result
+        self.recorded_at = time.monotonic()
+
+# =============================================================================
+# Gesture Registry
+# =============================================================================
+# Every gesture mapped to a scene is one row of the registry. All of them are
+# asked about in a single query per frame, so adding gestures does not add
+# API calls. Answers are read clause by clause: a gesture named after a
+# negation in the same clause ("there is no thumbs up") or followed by one
+# ("the thumbs up is not visible") does not count.
+
+Gesture = namedtuple("Gesture", "name scene")
+NEGATIONS = {"no", "not", "none", "without", "neither", "nor", "never", "cannot"}
+CLAUSE_BREAK = re.compile(r"[.,;:!?()\n]|\b(?:but|however|though|although|while|whereas)\b")
+# up to two words, then a negation, right after a name: "is not", "is no longer"
+NEGATED_AFTER = re.compile(r"(?:(?!and |or )[a-z0-9]+ ){0,2}(?:not|never|cannot|no longer)\b")
+NEGATED_AFTER_WORDS = 4
+
+gesture_registry = []
+
+def normalize_words(text):
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def parse_gesture_entry(entry):
+    """'peace sign = Slides' (or 'peace sign -> Slides') -> Gesture"""
+    name, sep, scene = entry.partition("->")
+    if not sep:
+        name, sep, scene = entry.partition("=")
+    name, scene = normalize_words(name), scene.strip()
+    if not sep or not name or not scene:
+        return None
+    return Gesture(name, scene)
+
+def build_registry():
+    gestures = []
+    if settings_data["thumbs_up_scene"]:
+        gestures.append(Gesture("thumbs up", settings_data["thumbs_up_scene"]))
+    if settings_data["thumbs_down_scene"]:
+        gestures.append(Gesture("thumbs down", settings_data["thumbs_down_scene"]))
+    for entry in settings_data["extra_gestures"]:
+        gesture = parse_gesture_entry(entry)
+        if gesture is None:
+            log_info(f"Ignoring gesture entry (expected 'gesture = Scene'): {entry!r}")
+        elif gesture.name not in [g.name for g in gestures]:
+            gestures.append(gesture)
+    return gestures
+
+def gesture_prompt(gestures):
+    names = ", ".join(g.name for g in gestures)
+    return (f"Which one of these hand gestures is clearly visible in this image: {names}? "
+            "Answer with only the gesture name, or NONE if none of them is visible.")
+
+def answer_clauses(answer):
+    """Normalized clauses of an answer ("isn't" reads as "is not")"""
+    text = re.sub(r"n['\u2019]t\b", " not", answer.lower())
+    return [normalize_words(clause) for clause in CLAUSE_BREAK.split(text)]
+
+def parse_gesture(answer, gestures):
+    """The registry entry named in the answer, or None. A name negated in
+    its clause is skipped, whether before it ("no thumbs up", "I don't see a
+    thumbs up") or after it ("the thumbs up is not visible", "thumbs up isn't
+    shown", "the thumbs up is no longer there"). When several names appear
+    the earliest wins, and the longest at the same position (so 'thumbs up'
+    is not mistaken for a gesture called 'thumbs')."""
+    for clause in answer_clauses(answer):
+        text = f" {clause} "
+        best = None
+        for gesture in gestures:
+            position = text.find(f" {gesture.name} ")
+            if position < 0 or NEGATIONS.intersection(text[:position].split()):
+                continue
+            if NEGATED_AFTER.match(text[position + len(gesture.name) + 2:]):
+                continue
+            rank = (position, -len(gesture.name))
+            if best is None or rank < best[0]:
+                best = (rank, gesture)
+        if best:
+            return best[1]
+    return None
+
 # =============================================================================
 # Moondream API
 # =============================================================================
+# One keep-alive connection per worker, reopened when the server drops it.
+# 429s, 5xx responses and network errors are retried with jittered
+# exponential backoff (a Retry-After header wins), and after
+# BREAKER_THRESHOLD failed calls in a row the circuit breaker opens: polling
+# pauses for BREAKER_COOLDOWN seconds (doubling up to BREAKER_MAX_COOLDOWN
+# while the outage lasts) before a single trial call is let through.
 
-def detect_gesture(image_base64, gesture_name):
-    """Call Moondream API to detect if a gesture is present"""
-    api_key = settings_data["api_key"]
-    if not api_key or not image_base64:
-        return False
+DEFAULT_API_BASE_URL = "https://api.moondream.ai/v1"
+API_TIMEOUT = 10
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 15.0
+BREAKER_MAX_COOLDOWN = 300.0
+STREAM_REJECTED = (400, 404, 415, 422, 501)
+STREAM_RETRY_SECONDS = 300  # complete answers only, after the API turned a stream down
+# How a kept-alive connection the server already closed fails (RemoteDisconnected
+# is the empty status line). Timeouts and other errors are not retried here.
+STALE_CONNECTION = (ConnectionResetError, BrokenPipeError, http.client.RemoteDisconnected)
+
+class MoondreamError(Exception):
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class CircuitOpen(MoondreamError):
+    pass
+
+def parse_retry_after(value):
+    """Retry-After in seconds (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class MoondreamClient:
+    def __init__(self, base_url, api_key, wait=None, observer=None, timeout=API_TIMEOUT):
+        parsed = urllib.parse.urlsplit(base_url.strip() or DEFAULT_API_BASE_URL)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError(f"Invalid API base URL: {base_url!r}")
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.prefix = parsed.path.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        # wait(seconds) sleeps and returns True if the caller should give up
+        self.wait = wait or (lambda seconds: time.sleep(seconds) or False)
+        # observer(status, seconds) sees every response (status None: no response)
+        self.observer = observer or (lambda status, latency: None)
+        self.local = threading.local()   # one connection per inference thread
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.cooldown = BREAKER_COOLDOWN
+        self.open_until = 0.0
+        self.calls = 0
+        self.no_stream_until = 0.0   # set while the API rejects streamed answers
     
-    url = "https://api.moondream.ai/v1/query"
-    headers = {
-        "X-Moondream-Auth": api_key,
-        "Content-Type": "application/json"
-    }
+    @property
+    def conn(self):
+        return getattr(self.local, "conn", None)
+    
+    def close(self):
+        """Close the calling thread's connection"""
+        if self.conn is not None:
+            self.conn.close()
+            self.local.conn = None
+    
+    def circuit_wait(self):
+        """Seconds until the breaker lets a call through (0 when closed)"""
+        return max(0.0, self.open_until - time.monotonic())
     
-    prompt = f"Is there a clear {gesture_name} hand gesture visible in this image? Answer only YES or NO."
+    def connection(self):
+        if self.conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            self.local.conn = cls(self.host, self.port, timeout=self.timeout)
+        return self.conn
     
+    def post(self, endpoint, payload, decide=None):
+        """POST a JSON payload and return the decoded JSON response. With
+        `decide`, a streamed answer is read only until decide(text so far)
+        returns the answer to use; see read_stream()."""
+        if self.circuit_wait():
+            raise CircuitOpen(f"API paused for {self.circuit_wait():.0f}s after repeated failures")
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"X-Moondream-Auth": self.api_key, "Content-Type": "application/json"}
+        
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                result = self.send(endpoint, body, headers, decide)
+            except MoondreamError as e:
+                retryable = e.status is None or e.status == 429 or e.status >= 500
+                if not retryable or attempt == MAX_ATTEMPTS - 1:
+                    self.record_failure(retryable)
+                    raise
+                delay = e.retry_after
+                if delay is None:
+                    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+                log_debug(f"{e}; retrying in {delay:.1f}s")
+                if self.wait(delay):
+                    raise
+                continue
+            with self.lock:
+                self.failures = 0
+                self.cooldown = BREAKER_COOLDOWN
+            return result
+    
+    def send(self, endpoint, body, headers, decide=None):
+        """One request; reconnects once if a kept-alive connection went stale"""
+        for reused in (self.conn is not None, False):
+            conn = self.connection()
+            started = time.monotonic()
+            result = None
+            try:
+                conn.request("POST", self.prefix + endpoint, body=body, headers=headers)
+                response = conn.getresponse()
+                content_type = response.getheader("Content-Type", "")
+                if decide and response.status == 200 and content_type.startswith("text/event-stream"):
+                    result = self.read_stream(response, decide)
+                else:
+                    data = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                self.close()
+                if reused and isinstance(e, STALE_CONNECTION):
+                    continue
+                self.observer(None, time.monotonic() - started)
+                raise MoondreamError(f"API connection error: {e}")
+            with self.lock:
+                self.calls += 1
+            self.observer(response.status, time.monotonic() - started)
+            if result is not None:
+                result["seconds"] = time.monotonic() - started
+                return result
+            if response.will_close:
+                self.close()
+            if response.status != 200:
+                raise MoondreamError(
+                    f"API HTTP Error: {response.status} - {response.reason}", response.status,
+                    parse_retry_after(response.getheader("Retry-After")))
+            try:
+                return json.loads(data.decode("utf-8"))
+            except ValueError:
+                raise MoondreamError("API returned invalid JSON", response.status)
+    
+    def read_stream(self, response, decide):
+        """Read server-sent `data: {"chunk": ...}` events until decide()
+        settles the answer, then drop the connection rather than wait for
+        the remaining tokens. A stream that completes first is used whole."""
+        text = ""
+        while True:
+            line = response.readline()
+            if not line:
+                break
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            try:
+                event = json.loads(line[5:])
+            except ValueError:
+                continue
+            text += str(event.get("chunk") or "")
+            if event.get("completed"):
+                response.read()
+                if response.will_close:
+                    self.close()
+                return {"answer": text, "early": False}
+            answer = decide(text)
+            if answer is not None:
+                self.close()
+                return {"answer": answer, "early": True}
+        self.close()
+        return {"answer": text, "early": False}
+    
+    def record_failure(self, outage):
+        """Count a failed call towards the breaker (client errors do not)"""
+        if not outage:
+            return
+        with self.lock:
+            self.failures += 1
+            if self.failures >= BREAKER_THRESHOLD:
+                self.open_until = time.monotonic() + self.cooldown
+                log_info(f"API unavailable, pausing detection for {self.cooldown:.0f}s")
+                self.cooldown = min(BREAKER_MAX_COOLDOWN, self.cooldown * 2)
+                self.failures = BREAKER_THRESHOLD - 1   # half-open: one more failure reopens
+
+def settled_answer(text, gestures):
+    """The part of a partly streamed answer that already decides it, or
+    None. The last word only counts once a separator follows it. A name
+    still counts only once its clause has ended or enough words follow it to
+    rule out a negation ("the thumbs up is not visible"), which also keeps a
+    longer registered name from extending it ('thumbs' before 'thumbs up').
+    An answer starting with "none" is settled at once; "no" is not, as in
+    "no thumbs down, but a thumbs up"."""
+    words = list(re.finditer(r"[a-z0-9]+", text, re.IGNORECASE))
+    if words and text[-1:].isalnum():
+        text = text[:words.pop().start()]
+    if not words:
+        return None
+    settled = text[:words[-1].end()]
+    if words[0].group().lower() == "none":
+        return settled
+    gesture = parse_gesture(settled, gestures)
+    if gesture is None:
+        return None
+    breaks = list(CLAUSE_BREAK.finditer(text.lower()))
+    if breaks and parse_gesture(text[:breaks[-1].start()], gestures) == gesture:
+        return settled
+    clause = f" {normalize_words(text[breaks[-1].end():] if breaks else text)} "
+    after = clause[clause.rfind(f" {gesture.name} ") + len(gesture.name) + 2:]
+    return settled if len(after.split()) >= NEGATED_AFTER_WORDS else None
+
+def classify_gesture(client, image_url, gestures):
+    """Ask Moondream which registered gesture (if any) is in the image.
+    Raises MoondreamError if the API call fails."""
+    if not image_url or not gestures:
+        return None
+    
+    stream = settings_data["stream_answers"] and time.monotonic() >= client.no_stream_until
     payload = {
-        "image_url": f"data:image/jpeg;base64,{image_base64}",
-        "question": prompt,
-        "stream": False
+        "image_url": image_url,
+        "question": gesture_prompt(gestures),
+        "stream": stream
     }
+    decide = (lambda text: settled_answer(text, gestures)) if stream else None
     
     try:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(url, data=data, headers=headers, method="POST")
-        
-        with urllib.request.urlopen(req, timeout=10) as response:
-            result = json.loads(response.read().decode("utf-8"))
-            answer = result.get("answer", "").upper().strip()
-            detected = "YES" in answer
-            log_debug(f"Gesture '{gesture_name}': {answer} -> {detected}")
-            return detected
-            
-    except urllib.error.HTTPError as e:
-        log_debug(f"API HTTP Error: {e.code} - {e.reason}")
-    except urllib.error.URLError as e:
-        log_debug(f"API URL Error: {e.reason}")
-    except Exception as e:
-        log_debug(f"API Error: {e}")
+        result = client.post("/query", payload, decide)
+    except MoondreamError as e:
+        if not stream or e.status not in STREAM_REJECTED:
+            raise
+        # Only blame streaming if the same request succeeds without it.
+        result = client.post("/query", dict(payload, stream=False))
+        client.no_stream_until = time.monotonic() + STREAM_RETRY_SECONDS
+        log_info(f"API rejected a streamed answer, using complete answers for "
+                 f"{STREAM_RETRY_SECONDS // 60} minutes")
+    answer = str(result.get("answer", "")).strip()
+    gesture = parse_gesture(answer, gestures)
+    if result.get("early"):
+        log_debug(f"Streamed answer decided after {result['seconds'] * 1000:.0f} ms")
+    log_debug(f"Gesture query: {answer!r} -> {gesture.name if gesture else 'none'}")
+    return gesture
+
+# =============================================================================
+# Adaptive Scheduling
+# =============================================================================
+# Frames are captured every detection_interval while nothing is happening.
+# As soon as a candidate gesture is seen the scheduler switches to a burst of
+# BURST_INTERVAL frames, so debounce confirms within a few hundred ms instead
+# of a few intervals. 429s, errors and slow responses raise a backoff
+# multiplier that decays again on fast successes, and every call is paid for
+# from a calls-per-minute budget (a token bucket).
+
+BURST_INTERVAL = 0.25
+LATENCY_FACTOR = 1.2        # never capture much faster than responses can arrive
+HIGH_LATENCY = 3.0
+MAX_BACKOFF = 16.0
+MAX_INTERVAL = 60.0
+LATENCY_SMOOTHING = 0.3
+
+class AdaptiveScheduler:
+    def __init__(self):
+        self.backoff = 1.0
+        self.latency = None
+        self.lock = threading.Lock()
+        self.tokens = self.capacity()
+        self.stamp = time.monotonic()
     
-    return False
+    def capacity(self):
+        return max(DEBOUNCE_REQUIRED + 1, settings_data["max_calls_per_minute"] / 12)
+    
+    def refill(self):
+        now = time.monotonic()
+        rate = settings_data["max_calls_per_minute"] / 60.0
+        self.tokens = min(self.capacity(), self.tokens + (now - self.stamp) * rate)
+        self.stamp = now
+    
+    def budget_wait(self):
+        """Seconds until the budget allows another call"""
+        with self.lock:
+            self.refill()
+            if self.tokens >= 1:
+                return 0.0
+            return (1 - self.tokens) / (settings_data["max_calls_per_minute"] / 60.0)
+    
+    def spend(self):
+        with self.lock:
+            self.refill()
+            self.tokens -= 1
+    
+    def observe(self, status, latency):
+        """Called by MoondreamClient for every response (status None on a
+        network error)"""
+        with self.lock:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+            if status is None or status == 429 or status >= 500:
+                self.backoff = min(MAX_BACKOFF, self.backoff * 2)
+            elif self.latency > HIGH_LATENCY:
+                self.backoff = min(MAX_BACKOFF, self.backoff * 1.5)
+            else:
+                self.backoff = max(1.0, self.backoff * 0.75)
+    
+    def interval(self, bursting):
+        """Seconds between frame captures"""
+        with self.lock:
+            interval = BURST_INTERVAL if bursting else settings_data["detection_interval"] / 1000.0
+            if self.latency is not None:
+                in_flight = max(1, settings_data["max_in_flight"])
+                interval = max(interval, self.latency * LATENCY_FACTOR / in_flight)
+            interval = min(MAX_INTERVAL, interval * self.backoff)
+            self.refill()
+            log_debug(f"Scheduler: {'burst' if bursting else 'idle'}, next frame in {interval * 1000:.0f} ms, "
+                      f"latency {(self.latency or 0) * 1000:.0f} ms, backoff x{self.backoff:.2f}, "
+                      f"budget {self.tokens:.1f} calls left of {settings_data['max_calls_per_minute']}/min")
+            return interval
 
 # =============================================================================
 # Scene Switching
@@ -316,54 +1117,243 @@ def switch_to_scene(scene_name):
     return False
 
 # =============================================================================
-# Main Detection Loop (called by OBS timer)
+# Debounce (runs on the worker threads, in frame order)
 # =============================================================================
 
-def detection_callback():
-    """Main detection callback - runs on OBS timer"""
-    global thumbs_up_count, thumbs_down_count
+def debounce_step(gesture):
+    """Update the debounce state with one classification result (results
+    arrive in frame order). Returns the scene to switch to, or None."""
+    global candidate_gesture, candidate_count
     
-    if not settings_data["enabled"]:
-        return
+    if gesture is None:
+        candidate_gesture, candidate_count = None, 0
+        return None
     
-    if not settings_data["api_key"]:
-        log_debug("No API key configured")
-        return
+    if gesture == candidate_gesture:
+        candidate_count += 1
+    else:
+        candidate_gesture, candidate_count = gesture, 1
+    log_debug(f"{gesture.name.capitalize()} detected ({candidate_count}/{DEBOUNCE_REQUIRED})")
     
-    if not settings_data["source_name"]:
-        log_debug("No video source selected")
-        return
+    if candidate_count >= DEBOUNCE_REQUIRED:
+        candidate_gesture, candidate_count = None, 0
+        return gesture.scene
+    return None
+
+# =============================================================================
+# Background Worker
+# =============================================================================
+# Capture, encoding and API calls never run on the OBS thread. The capture
+# thread grabs frames at the rate AdaptiveScheduler picks into a one-slot
+# "latest frame wins" queue, numbering them in capture order. Up to
+# max_in_flight inference threads each take the newest frame, so frame N+1
+# is captured and sent while frame N is still in flight and throughput is
+# bounded by the API rate rather than by the sum of latencies. Results are
+# applied to the debounce state strictly in frame order: a response that
+# arrives after a newer frame's result was applied is stale and dropped.
+# Scene switches are handed back to the OBS thread through pending_scenes,
+# which a short OBS timer drains.
+
+class LatestFrame:
+    """Bounded (size 1) queue where a new frame replaces an unread one"""
     
-    # Capture frame from source
-    image_base64 = capture_source_frame()
-    if not image_base64:
-        log_debug("Failed to capture frame")
-        return
+    def __init__(self):
+        self.frame = None
+        self.seq = 0
+        self.dropped = 0
+        self.cond = threading.Condition()
     
-    log_debug("Frame captured, detecting gestures...")
+    def put(self, frame):
+        with self.cond:
+            if self.frame is not None:
+                self.dropped += 1
+            self.seq += 1
+            self.frame = (self.seq, frame)
+            self.cond.notify()
     
-    # Check for thumbs up
-    if settings_data["thumbs_up_scene"]:
-        if detect_gesture(image_base64, "thumbs up"):
-            thumbs_up_count += 1
-            thumbs_down_count = 0
-            log_debug(f"Thumbs up detected ({thumbs_up_count}/{DEBOUNCE_REQUIRED})")
-            
-            if thumbs_up_count >= DEBOUNCE_REQUIRED:
-                switch_to_scene(settings_data["thumbs_up_scene"])
-                thumbs_up_count = 0
-        else:
-            thumbs_up_count = 0
+    def get(self, timeout):
+        """(sequence number, frame), or None after `timeout`"""
+        with self.cond:
+            if self.frame is None:
+                self.cond.wait(timeout)
+            item, self.frame = self.frame, None
+            return item
+
+class DetectionWorker:
+    """Owns the capture and inference threads for one settings generation"""
     
-    # Check for thumbs down
-    if settings_data["thumbs_down_scene"]:
-        if detect_gesture(image_base64, "thumbs down"):
-            thumbs_down_count += 1
-            thumbs_up_count = 0
-            log_debug(f"Thumbs down detected ({thumbs_down_count}/{DEBOUNCE_REQUIRED})")
-            
-            if thumbs_down_count >= DEBOUNCE_REQUIRED:
-                switch_to_scene(settings_data["thumbs_down_scene"])
-                thumbs_down_count = 0
+    def __init__(self):
+        self.stop_event = threading.Event()
+        self.frames = LatestFrame()
+        self.grabber = FrameGrabber()
+        self.gate = ChangeGate()
+        self.shaper = UploadShaper()
+        self.scheduler = AdaptiveScheduler()
+        self.wake = threading.Event()   # set to start a burst early
+        self.client = MoondreamClient(settings_data["api_base_url"], settings_data["api_key"],
+                                      wait=self.stop_event.wait, observer=self.scheduler.observe)
+        # guards the gate, the shaper and the debounce state across inference threads
+        self.lock = threading.Lock()
+        self.applied = 0    # newest frame whose result was applied
+        self.stale = 0
+        self.threads = [threading.Thread(target=self.capture_loop, name="moondream-capture", daemon=True)]
+        for i in range(max(1, settings_data["max_in_flight"])):
+            self.threads.append(threading.Thread(
+                target=self.inference_loop, name=f"moondream-inference-{i + 1}", daemon=True))
+    
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+    
+    def stop(self, timeout=0):
+        """Signal all threads; requests in flight finish in the background
+        and their results are discarded, so this never blocks OBS for long."""
+        self.stop_event.set()
+        self.wake.set()
+        with self.frames.cond:
+            self.frames.cond.notify_all()
+        if timeout:
+            for thread in self.threads:
+                thread.join(timeout)
+    
+    def capture_loop(self):
+        try:
+            self.capture_frames()
+        finally:
+            self.grabber.release()
+    
+    def capture_frames(self):
+        while not self.stop_event.is_set():
+            paused = self.client.circuit_wait() or self.scheduler.budget_wait()
+            if paused:
+                self.stop_event.wait(paused)
+                continue
+            self.capture_once()
+    
+    def capture_once(self):
+        started = time.monotonic()
+        try:
+            frame = capture_source_frame(self.grabber)
+            if frame:
+                self.frames.put(frame)
+            else:
+                log_debug("Failed to capture frame")
+        except Exception as e:
+            log_debug(f"Capture error: {e}")
+        interval = self.scheduler.interval(candidate_gesture is not None)
+        self.wake.wait(max(0.0, interval - (time.monotonic() - started)))
+        self.wake.clear()
+    
+    def inference_loop(self):
+        try:
+            self.infer_frames()
+        finally:
+            self.client.close()
+    
+    def infer_frames(self):
+        while not self.stop_event.is_set():
+            item = self.frames.get(timeout=1.0)
+            if not item or self.stop_event.is_set():
+                continue
+            seq, frame = item
+            try:
+                scene = self.detect(seq, frame)
+            except Exception as e:
+                log_debug(f"Detection error: {e}")
+                continue
+            if scene and not self.stop_event.is_set():
+                pending_scenes.append(scene)
+    
+    def detect(self, seq, frame):
+        """Classify a frame, or reuse the last result if it is unchanged, and
+        apply the result. Returns the scene to switch to, or None."""
+        with self.lock:
+            signature = self.gate.signature(frame)
+            reused = candidate_gesture is None and self.gate.unchanged(signature)
+            if reused:
+                self.gate.saved += 1
+                log_debug(f"Frame unchanged, reusing last result ({self.gate.saved} API calls saved)")
+                gesture = self.gate.result
+                scene, follow = self.finish(seq, gesture)
+            else:
+                self.scheduler.spend()
+            if not reused or follow:
+                image_url, region = self.shaper.prepare(frame)
+        if not reused:
+            log_debug(f"Frame {seq} sent, classifying gesture...")
+            try:
+                gesture = classify_gesture(self.client, image_url, gesture_registry)
+            except Exception as e:
+                log_debug(str(e) if isinstance(e, MoondreamError) else f"API Error: {e}")
+                gesture, signature = None, None
+            if self.stop_event.is_set():
+                return None
+            with self.lock:
+                # Only a successful result becomes the reference for later frames.
+                if signature is not None and seq >= self.applied:
+                    self.gate.record(signature, gesture)
+                scene, follow = self.finish(seq, gesture)
+        if follow:
+            self.shaper.follow(self.client, image_url, region, gesture)
+        return scene
+    
+    def finish(self, seq, gesture):
+        """Apply a result in frame order. Returns (scene to switch to,
+        whether to look up the gesture's region)."""
+        if seq < self.applied:
+            self.stale += 1
+            log_debug(f"Dropped stale result for frame {seq} (frame {self.applied} already applied, "
+                      f"{self.stale} dropped)")
+            return None, False
+        self.applied = seq
+        previous = candidate_gesture
+        scene = debounce_step(gesture)
+        return scene, self.shape_uploads(previous, scene)
+    
+    def shape_uploads(self, previous, scene):
+        """Start a burst on a new candidate gesture and adjust the quality
+        ladder. Returns True if the candidate's region should be looked up."""
+        follow = False
+        if previous is None and candidate_gesture is not None:
+            self.wake.set()
+            follow = settings_data["roi_mode"] == ROI_FOLLOW and self.scheduler.budget_wait() == 0
+            if follow:
+                self.scheduler.spend()
+        elif previous is not None and not scene and candidate_gesture != previous:
+            self.shaper.confirmation_failed()
         else:
-            thumbs_down_count = 0
+            self.shaper.succeeded()
+        if candidate_gesture is None:
+            self.shaper.unfollow()
+        return follow
+
+def start_worker():
+    global worker
+    try:
+        worker = DetectionWorker()
+    except ValueError as e:
+        log_info(str(e))
+        return
+    if Image is None:
+        log_info("WARNING: Pillow not found in OBS's Python: sending frames as "
+                 f"{PNG_FALLBACK_WIDTH}px-wide PNG instead of JPEG (larger uploads, "
+                 "JPEG quality ignored); install Pillow there for JPEG")
+    worker.start()
+    obs.timer_add(apply_pending_actions, ACTION_POLL_MS)
+
+def stop_worker(timeout=0):
+    global worker
+    obs.timer_remove(apply_pending_actions)
+    if worker:
+        if worker.gate.saved:
+            log_info(f"Skipped {worker.gate.saved} API calls on unchanged frames")
+        if worker.stale:
+            log_debug(f"Dropped {worker.stale} stale out-of-order results")
+        worker.stop(timeout)
+        worker = None
+    pending_scenes.clear()
+
+def apply_pending_actions():
+    """OBS timer: perform scene switches requested by the worker"""
+    while pending_scenes:
+        switch_to_scene(pending_scenes.popleft())
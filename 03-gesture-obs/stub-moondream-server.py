@@ -0,0 +1,180 @@
+"""
+Stub Moondream Server
+==========================================
+A local stand-in for the Moondream /v1 API that answers every request with
+a fixed answer, generated token by token, for testing
+moondream-gesture-control.py without an API key or network.
+
+With "stream": true the answer is sent as server-sent events
+(data: {"chunk": ...} per token, then data: {"completed": true}); otherwise
+as one JSON body once the whole answer has been "generated".
+
+Usage:
+    python stub-moondream-server.py                      # serve on port 8765
+    python stub-moondream-server.py --answer "NONE"
+    python stub-moondream-server.py --no-stream          # ignore "stream": true
+    python stub-moondream-server.py --bench 20           # measure time saved
+
+Then set the script's API Base URL to http://127.0.0.1:8765/v1
+
+Author: StreamGeeks
+License: MIT
+"""
+
+import argparse
+import http.client
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = "Thumbs up. The person in the center of the frame is clearly giving a thumbs up."
+
+# =============================================================================
+# Stub API
+# =============================================================================
+
+def tokenize(answer):
+    """Split an answer into word-piece 'tokens' (each keeps its leading space)"""
+    return re.findall(r"\s*\S+", answer)
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self.send_json(400, {"error": "invalid JSON"})
+
+        stream = bool(payload.get("stream"))
+        if stream and self.server.reject_stream:
+            return self.send_json(400, {"error": "streaming is not supported"})
+
+        time.sleep(self.server.prefill)
+        tokens = tokenize(self.server.answer)
+        if not stream or not self.server.streaming:
+            time.sleep(self.server.token_delay * len(tokens))
+            return self.send_json(200, {"answer": self.server.answer, "request_id": "stub"})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in tokens:
+                self.send_chunk({"chunk": token, "completed": False})
+                time.sleep(self.server.token_delay)
+            self.send_chunk({"chunk": "", "completed": True})
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            # the client decided early and hung up
+            self.close_connection = True
+
+    def send_chunk(self, event):
+        data = f"data: {json.dumps(event)}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def make_server(args, port):
+    server = ThreadingHTTPServer((args.bind, port), StubHandler)
+    server.daemon_threads = True
+    server.answer = args.answer
+    server.prefill = args.prefill_ms / 1000.0
+    server.token_delay = args.token_ms / 1000.0
+    server.streaming = not args.no_stream
+    server.reject_stream = args.reject_stream
+    server.verbose = not args.bench
+    return server
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+def timed_query(port, stream, words):
+    """Seconds until the answer is known: once `words` complete words have
+    streamed in (as the gesture script decides), the whole body otherwise"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    body = json.dumps({"image_url": "data:image/jpeg;base64,", "question": "?", "stream": stream})
+    started = time.monotonic()
+    conn.request("POST", "/v1/query", body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    if stream:
+        text = ""
+        while len(re.findall(r"\w+\W", text)) < words:
+            line = response.readline()
+            if not line:
+                break
+            if line.startswith(b"data:"):
+                text += json.loads(line[5:]).get("chunk", "")
+    else:
+        response.read()
+    elapsed = time.monotonic() - started
+    conn.close()
+    return elapsed
+
+def bench(args):
+    server = make_server(args, 0)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        full = [timed_query(port, False, 0) for _ in range(args.bench)]
+        early = [timed_query(port, True, args.decide_words) for _ in range(args.bench)]
+    finally:
+        server.shutdown()
+    full_ms = sum(full) / len(full) * 1000
+    early_ms = sum(early) / len(early) * 1000
+    print(f"Answer: {args.answer!r} ({len(tokenize(args.answer))} tokens)")
+    print(f"Complete answer:  {full_ms:7.1f} ms")
+    print(f"Early decision:   {early_ms:7.1f} ms (after {args.decide_words} words)")
+    print(f"Saved per call:   {full_ms - early_ms:7.1f} ms ({(1 - early_ms / full_ms) * 100:.0f}%)")
+
+# =============================================================================
+# Main
+# =============================================================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stub Moondream API with streamed answers")
+    parser.add_argument("port", type=int, nargs="?", default=8765)
+    parser.add_argument("--bind", default="127.0.0.1")
+    parser.add_argument("--answer", default=DEFAULT_ANSWER, help="answer given to every query")
+    parser.add_argument("--prefill-ms", type=float, default=250,
+                        help="delay before the first token (default: 250)")
+    parser.add_argument("--token-ms", type=float, default=30,
+                        help="delay per generated token (default: 30)")
+    parser.add_argument("--no-stream", action="store_true",
+                        help='answer "stream": true requests with plain JSON')
+    parser.add_argument("--reject-stream", action="store_true",
+                        help='answer "stream": true requests with 400')
+    parser.add_argument("--bench", type=int, metavar="N", default=0,
+                        help="run N queries each way and report the time saved, then exit")
+    parser.add_argument("--decide-words", type=int, default=2,
+                        help='words needed to decide in --bench, e.g. 2 for "thumbs up" (default: 2)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.bench:
+        bench(args)
+    else:
+        server = make_server(args, args.port)
+        print(f"Stub Moondream API on http://{args.bind}:{args.port}/v1 (answer: {args.answer!r})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -9,12 +9,20 @@ class PTZController {
         this.useAuth = options.useAuth || false;
         this.username = options.username || '';
         this.password = options.password || '';
+
+        // Optional server.py PTZ proxy (e.g. '/ptz'): keeps a persistent
+        // connection to the camera and drops stale move commands
+        this.proxyBase = options.proxyBase || '';
     }
 
     setCameraIP(ip) {
         this.cameraIP = ip;
     }
 
+    setProxyBase(proxyBase) {
+        this.proxyBase = (proxyBase || '').replace(/\/+$/, '');
+    }
+
     setAuth(useAuth, username = '', password = '') {
         this.useAuth = useAuth;
         this.username = username;
@@ -27,7 +35,9 @@ class PTZController {
         }
         
         try {
-            const url = `http://${this.cameraIP}/cgi-bin/ptzctrl.cgi?${command}`;
+            const url = this.proxyBase
+                ? `${this.proxyBase}/${this.cameraIP}/cgi-bin/ptzctrl.cgi?${command}`
+                : `http://${this.cameraIP}/cgi-bin/ptzctrl.cgi?${command}`;
             if (window.reasoningConsole) {
                 window.reasoningConsole.logInfo(`PTZ Command: ${command}`);
             }
@@ -12,6 +12,10 @@ class PTZController {
         this.useAuth = options.useAuth || false;
         this.username = options.username || '';
         this.password = options.password || '';
+
+        // Optional server.py PTZ proxy (e.g. '/ptz'): keeps a persistent
+        // connection to the camera and drops stale move commands
+        this.proxyBase = options.proxyBase || '';
         
         // Center offset - adjust where "center" actually is in the frame
         // Values are percentages: 0 = left/top edge, 50 = actual center, 100 = right/bottom edge
@@ -60,6 +64,13 @@ class PTZController {
         this.cameraIP = ip;
     }
 
+    /**
+     * Route commands through the server.py PTZ proxy ('' to talk to the camera directly)
+     */
+    setProxyBase(proxyBase) {
+        this.proxyBase = (proxyBase || '').replace(/\/+$/, '');
+    }
+
     /**
      * Update center offset
      */
@@ -94,7 +105,9 @@ class PTZController {
      */
     async sendCommand(command) {
         try {
-            const url = `http://${this.cameraIP}/cgi-bin/ptzctrl.cgi?${command}`;
+            const url = this.proxyBase
+                ? `${this.proxyBase}/${this.cameraIP}/cgi-bin/ptzctrl.cgi?${command}`
+                : `http://${this.cameraIP}/cgi-bin/ptzctrl.cgi?${command}`;
             const fetchOptions = { 
                 method: 'GET',
                 mode: 'no-cors'
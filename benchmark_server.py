@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Load-test and benchmark runner for the Visual Reasoning Playground server.
+
+Starts server.py on a random local port (with the offline stub inference
+backend) and hammers it with a configurable mix of requests:
+
+    small       - JS / CSS / HTML fetches, browser-style with gzip
+    video       - full sample MP4 downloads
+    range       - random 64 KB Range seeks into sample videos
+    revalidate  - conditional If-None-Match requests (expect 304)
+    proxy       - /v1/query calls through the caching inference proxy
+
+Reports throughput, p50/p95/p99 latency per request type and the server's
+peak RSS as JSON, so engines and changes can be compared.
+
+Usage:
+    python benchmark_server.py
+    python benchmark_server.py --engine threads asyncio single --duration 20
+    python benchmark_server.py --mix small=50,range=30,proxy=20 --concurrency 64
+    python benchmark_server.py --output results.json -- --compress-cache-mb 16
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import base64
+import glob
+import http.client
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SERVER = os.path.join(ROOT, 'server.py')
+DEFAULT_MIX = 'small=60,video=5,range=20,revalidate=10,proxy=5'
+SCENARIOS = ('small', 'video', 'range', 'revalidate', 'proxy')
+RANGE_SIZE = 64 * 1024
+PROXY_IMAGES = 8
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start listening in time')
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'unknown request type: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def peak_rss_mb(pid):
+    """Peak resident set size of a running process (Linux), else None."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# =============================================================================
+# Workload
+# =============================================================================
+
+class Workload:
+    """Request targets discovered from the served tree."""
+
+    def __init__(self, port):
+        self.port = port
+        self.small = sorted(
+            '/' + os.path.relpath(p, ROOT).replace(os.sep, '/')
+            for p in glob.glob(os.path.join(ROOT, 'shared', '*.js'))
+            + glob.glob(os.path.join(ROOT, 'shared', '*.css'))
+            + glob.glob(os.path.join(ROOT, '*', 'index.html'))
+            + glob.glob(os.path.join(ROOT, 'index.html')))
+        self.videos = sorted(
+            '/' + os.path.relpath(p, ROOT).replace(os.sep, '/')
+            for p in glob.glob(os.path.join(ROOT, 'assets', 'sample-videos', '*.mp4')))
+        self.sizes = {path: os.path.getsize(os.path.join(ROOT, path[1:])) for path in self.videos}
+        self.images = [
+            'data:image/jpeg;base64,' + base64.b64encode(os.urandom(48 * 1024)).decode('ascii')
+            for _ in range(PROXY_IMAGES)]
+        self.etags = {}
+
+    def prime(self):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        for path in self.small:
+            conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = conn.getresponse()
+            response.read()
+            if response.getheader('ETag'):
+                self.etags[path] = response.getheader('ETag')
+        conn.close()
+
+    def request(self, conn, scenario, rng):
+        """Issue one request; return (bytes received, ok)."""
+        if scenario == 'small':
+            path = rng.choice(self.small)
+            conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            expected = (200,)
+        elif scenario == 'video':
+            conn.request('GET', rng.choice(self.videos))
+            expected = (200,)
+        elif scenario == 'range':
+            path = rng.choice(self.videos)
+            start = rng.randrange(max(self.sizes[path] - RANGE_SIZE, 1))
+            conn.request('GET', path, headers={'Range': f'bytes={start}-{start + RANGE_SIZE - 1}'})
+            expected = (206,)
+        elif scenario == 'revalidate':
+            path = rng.choice(list(self.etags) or self.small)
+            conn.request('GET', path, headers={'Accept-Encoding': 'gzip',
+                                               'If-None-Match': self.etags.get(path, '"none"')})
+            expected = (304,)
+        else:
+            body = json.dumps({'image_url': rng.choice(self.images),
+                               'question': 'Is there a thumbs up?', 'stream': False})
+            conn.request('POST', '/v1/query', body=body,
+                         headers={'Content-Type': 'application/json', 'X-Moondream-Auth': 'bench'})
+            expected = (200,)
+        response = conn.getresponse()
+        data = response.read()
+        return len(data), response.status in expected
+
+
+def run_client(workload, scenarios, weights, deadline, max_requests, counter, seed, results):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', workload.port, timeout=60)
+    while time.time() < deadline:
+        with counter['lock']:
+            if max_requests and counter['issued'] >= max_requests:
+                break
+            counter['issued'] += 1
+        scenario = rng.choices(scenarios, weights)[0]
+        started = time.perf_counter()
+        try:
+            nbytes, ok = workload.request(conn, scenario, rng)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', workload.port, timeout=60)
+            nbytes, ok = 0, False
+        results.append((scenario, time.perf_counter() - started, nbytes, ok))
+    conn.close()
+
+
+# =============================================================================
+# Runner
+# =============================================================================
+
+def run_engine(engine, args, server_args):
+    port = free_port()
+    command = [sys.executable, SERVER, str(port), '--bind', '127.0.0.1', '--engine', engine,
+               '--upstream', 'stub', '--stub-delay', str(args.stub_delay),
+               '--access-log', 'off'] + server_args
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    peak = None
+    try:
+        wait_for_port(port, process)
+        workload = Workload(port)
+        workload.prime()
+
+        scenarios = list(args.mix)
+        weights = [args.mix[s] for s in scenarios]
+        results = []
+        counter = {'issued': 0, 'lock': threading.Lock()}
+        started = time.perf_counter()
+        deadline = time.time() + args.duration
+        sampler_done = threading.Event()
+        rss_samples = []
+
+        def sample_rss():
+            while not sampler_done.wait(0.25):
+                rss_samples.append(peak_rss_mb(process.pid))
+
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        sampler.start()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            for i in range(args.concurrency):
+                pool.submit(run_client, workload, scenarios, weights, deadline, args.requests,
+                            counter, args.seed + i, results)
+        elapsed = time.perf_counter() - started
+        sampler_done.set()
+        sampler.join()
+        peak = peak_rss_mb(process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    if peak is None:
+        # ru_maxrss is KB on Linux, bytes on macOS; only waited children count.
+        maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        peak = maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return summarize(engine, results, elapsed, peak)
+
+
+def summarize(engine, results, elapsed, peak_rss):
+    report = {
+        'engine': engine,
+        'duration_s': round(elapsed, 3),
+        'requests': len(results),
+        'errors': sum(1 for r in results if not r[3]),
+        'throughput_rps': round(len(results) / elapsed, 1) if elapsed else None,
+        'bytes_received': sum(r[2] for r in results),
+        'throughput_mb_s': round(sum(r[2] for r in results) / elapsed / 1048576, 2) if elapsed else None,
+        'server_peak_rss_mb': round(peak_rss, 1) if peak_rss else None,
+        'latency_ms': {},
+    }
+    for scenario in SCENARIOS:
+        latencies = sorted(r[1] * 1000 for r in results if r[0] == scenario)
+        if not latencies:
+            continue
+        report['latency_ms'][scenario] = {
+            'count': len(latencies),
+            'errors': sum(1 for r in results if r[0] == scenario and not r[3]),
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3),
+        }
+    all_latencies = sorted(r[1] * 1000 for r in results)
+    report['latency_ms']['all'] = {
+        'p50': percentile(all_latencies, 50) and round(percentile(all_latencies, 50), 3),
+        'p95': percentile(all_latencies, 95) and round(percentile(all_latencies, 95), 3),
+        'p99': percentile(all_latencies, 99) and round(percentile(all_latencies, 99), 3),
+    }
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark server.py under concurrent load',
+        epilog='Arguments after "--" are passed to server.py unchanged.')
+    parser.add_argument('--engine', nargs='+', default=['threads'],
+                        choices=['threads', 'asyncio', 'single'],
+                        help='server engine(s) to benchmark, one run each (default: threads)')
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help='simultaneous client connections (default: 32)')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds per run (default: 10)')
+    parser.add_argument('--requests', type=int, default=0,
+                        help='stop after this many requests per run (default: no limit)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'request type weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--stub-delay', type=float, default=0.05,
+                        help='simulated inference latency of the stub backend in seconds (default: 0.05)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    if argv is None:
+        argv = sys.argv[1:]
+    server_args = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, server_args = argv[:split], argv[split + 1:]
+    return parser.parse_args(argv), server_args
+
+
+if __name__ == '__main__':
+    args, server_args = parse_args()
+    reports = [run_engine(engine, args, server_args) for engine in args.engine]
+    output = json.dumps(reports if len(reports) > 1 else reports[0], indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
@@ -8,15 +8,30 @@ class OBSClient {
         this.pendingRequests = new Map();
         this.onStatusChange = null;
         this.onSceneChange = null;
+        this.hubUrl = null;
         this.onScenesLoaded = null;
     }
 
+    /**
+     * Share one OBS connection between all tabs through the server.py hub,
+     * e.g. useHub(`ws://${location.host}/obs`); pass null to connect directly
+     */
+    useHub(hubUrl) {
+        this.hubUrl = hubUrl ? hubUrl.replace(/\/+$/, '') : null;
+    }
+
+    _socketUrl(url) {
+        if (!this.hubUrl) return url;
+        const obsAddress = url.replace(/^wss?:\/\//, '').replace(/\/.*$/, '');
+        return `${this.hubUrl}/${obsAddress}`;
+    }
+
     async connect(url = 'ws://localhost:4455', password = '') {
         return new Promise((resolve, reject) => {
             try {
                 console.log(`[OBS] Connecting to ${url}...`);
                 
-                this.ws = new WebSocket(url);
+                this.ws = new WebSocket(this._socketUrl(url));
                 
                 this.ws.onopen = () => {
                     console.log('[OBS] WebSocket connected, awaiting Hello...');
@@ -66,6 +81,9 @@ class OBSClient {
 
     async _handleHello(data, password) {
         const authPayload = { rpcVersion: 1 };
+
+        // The hub authenticates to OBS on our behalf, so it needs the password itself
+        if (this.hubUrl) authPayload.password = password;
         
         if (data.authentication) {
             const { challenge, salt } = data.authentication;
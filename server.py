@@ -5,25 +5,3186 @@ Allows sample videos to work with AI detection locally.
 
 Usage:
     python server.py
-    
+    python server.py 8080 --engine asyncio --threads 32
+
 Then open http://localhost:8000 in your browser.
+
+Engines:
+    threads  - bounded thread pool; idle keep-alive connections wait in a
+               selector thread, workers only run while a request is being
+               served (default)
+    asyncio  - the same, with an asyncio event loop accepting connections
+               and parking idle ones
+    single   - the original one-request-at-a-time HTTPServer, closing the
+               connection after each response
 """
 
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer, SimpleHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import asyncio
+import base64
+import binascii
+import bisect
+import gzip
+import hashlib
+import http.client
+import ipaddress
+import json
+import mimetypes
+import mmap
+import os
+import queue
+import selectors
+import shutil
+import signal
+import socket
+import stat
+import struct
+import subprocess
 import sys
+import tempfile
+import threading
+import time
+import traceback
+import urllib.parse
+import uuid
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_THREADS = 16
+DEFAULT_KEEPALIVE = 15
+DEFAULT_MAX_STREAMS = 256
+MAX_RANGES = 16
+MMAP_CHUNK = 256 * 1024
+FAIR_CHUNK = 64 * 1024
+FAIR_THRESHOLD = 256 * 1024     # smaller bodies are never split
+HASH_CHUNK = 1024 * 1024
+DEFAULT_MEDIA_MAX_AGE = 86400
+NO_STORE = 'no-store, no-cache, must-revalidate'
+DEFAULT_COMPRESS_CACHE_MB = 64
+MIN_COMPRESS_SIZE = 512
+COMPRESSIBLE_TYPES = ('application/javascript', 'application/json', 'image/svg+xml')
+DEFAULT_UPSTREAM = 'https://api.moondream.ai'
+INFERENCE_ENDPOINTS = ('query', 'detect', 'caption', 'point')
+PROMPT_FIELDS = {'query': 'question', 'detect': 'object', 'point': 'object'}
+UPLOAD_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/gif')
+BASE64_CHUNK = 48 * 1024        # multiple of 3, so chunks encode independently
+DEFAULT_PROXY_CACHE_ENTRIES = 1024
+MAX_REQUEST_BODY = 32 * 1024 * 1024
+UPSTREAM_TIMEOUT = 30
+FFMPEG = shutil.which('ffmpeg')
+FFPROBE = shutil.which('ffprobe')
+DEFAULT_FRAME_INDEX_DIR = os.path.join(tempfile.gettempdir(), 'playground-frame-index')
+DEFAULT_FRAME_CACHE_MB = 64
+DEFAULT_FRAME_PREFETCH = 30
+MAX_FRAME_SIZE = 4096
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+MAX_WS_MESSAGE = 16 * 1024 * 1024
+DEFAULT_STREAM_FPS = 15
+STREAM_STALL_TIMEOUT = 10
+DEFAULT_PTZ_RATE = 10           # commands per second per camera
+PTZ_TIMEOUT = 5
+PTZ_PATHS = ('cgi-bin/ptzctrl.cgi', 'cgi-bin/param.cgi')
+PTZ_AXES = {
+    'left': 'pantilt', 'right': 'pantilt', 'up': 'pantilt', 'down': 'pantilt',
+    'leftup': 'pantilt', 'rightup': 'pantilt', 'leftdown': 'pantilt', 'rightdown': 'pantilt',
+    'ptzstop': 'pantilt', 'home': 'pantilt',
+    'zoomin': 'zoom', 'zoomout': 'zoom', 'zoomstop': 'zoom', 'abszoom': 'zoom',
+    'focusin': 'focus', 'focusout': 'focus', 'focusstop': 'focus',
+}
+DEFAULT_BUS_REPLAY = 20
+BUS_SUBSCRIBER_QUEUE = 256
+BUS_HEARTBEAT = 15
+OBS_DEFAULT_PORT = 4455
+OBS_TIMEOUT = 5
+OBS_CACHED_REQUESTS = {
+    'GetVersion', 'GetSceneList', 'GetCurrentProgramScene', 'GetCurrentPreviewScene',
+    'GetStudioModeEnabled', 'GetInputList', 'GetSceneItemList', 'GetSceneItemId', 'GetSceneItemEnabled',
+}
+# Events and the cached reads they make stale; None drops everything.
+OBS_EVENT_INVALIDATES = {
+    'CurrentProgramSceneChanged': {'GetSceneList', 'GetCurrentProgramScene'},
+    'CurrentPreviewSceneChanged': {'GetSceneList', 'GetCurrentPreviewScene'},
+    'SceneListChanged': {'GetSceneList'},
+    'SceneCreated': None,
+    'SceneRemoved': None,
+    'SceneNameChanged': None,
+    'StudioModeStateChanged': {'GetStudioModeEnabled', 'GetCurrentPreviewScene', 'GetSceneList'},
+    'InputCreated': {'GetInputList'},
+    'InputRemoved': None,
+    'InputNameChanged': None,
+    'SceneItemCreated': {'GetSceneItemList', 'GetSceneItemId'},
+    'SceneItemRemoved': {'GetSceneItemList', 'GetSceneItemId', 'GetSceneItemEnabled'},
+    'SceneItemListReindexed': {'GetSceneItemList'},
+    'SceneItemEnableStateChanged': {'GetSceneItemEnabled', 'GetSceneItemList'},
+}
+PTZ_DIRECTIONS = {
+    'left': (-1, 0), 'right': (1, 0), 'up': (0, 1), 'down': (0, -1),
+    'leftup': (-1, 1), 'rightup': (1, 1), 'leftdown': (-1, -1), 'rightdown': (1, -1),
+}
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ACCESS_LOG_QUEUE = 10000
+METRIC_LABELS = ('route', 'ext', 'method', 'status')
+METRIC_TIMING_LABELS = ('route', 'ext')
+SHARED_SCALARS = {'playground_asset_duplicate_files', 'playground_asset_duplicate_bytes'}
+METRICS_SNAPSHOT_INTERVAL = 1.0
+WORKER_MIN_UPTIME = 5          # seconds; faster exits count as a crash loop
+WORKER_RESTART_DELAY = 1
+
+
+# =============================================================================
+# Static File Bodies
+# =============================================================================
+
+def parse_range_header(header, size):
+    """Parse a `Range: bytes=...` header into sorted, merged (start, end) pairs.
+
+    Returns None when the header should be ignored (not bytes, malformed or
+    too many ranges) and [] when no range is satisfiable.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    ranges = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        first, dash, last = item.partition('-')
+        if not dash:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else max(start, size - 1)
+                if start > end:
+                    return None
+            else:
+                suffix = int(last)
+                start, end = max(size - suffix, 0), size - 1
+                if suffix == 0:
+                    continue
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def send_file_range(sock, wfile, f, offset, count, mapping=None):
+    """Send `count` bytes of `f` from `offset` without copying through Python.
+
+    Uses sendfile(2) where the OS has it and falls back to writing slices of
+    a read-only memory map (`mapping`, or a private one when not given).
+    """
+    if count <= 0:
+        return
+    if hasattr(os, 'sendfile'):
+        sock.sendfile(f, offset, count)
+        return
+    if mapping is not None:
+        _write_mapping(wfile, mapping, offset, count)
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        _write_mapping(wfile, mm, offset, count)
+
+
+def _write_mapping(wfile, mapping, offset, count):
+    view = memoryview(mapping)
+    try:
+        end = offset + count
+        for start in range(offset, end, MMAP_CHUNK):
+            wfile.write(view[start:min(start + MMAP_CHUNK, end)])
+    finally:
+        view.release()
+
+
+class FileBody:
+    """A response body made of literal byte strings and (offset, length)
+    slices of an open file. Returned from send_head in place of a file object.
+
+    `mapping` is an optional zero-argument callable returning a shared mmap of
+    the same file, used instead of a private one when sendfile is unavailable.
+    """
+
+    def __init__(self, file, parts, mapping=None):
+        self.file = file
+        self.parts = parts
+        self.mapping = mapping
+
+    def __len__(self):
+        return sum(len(p) if isinstance(p, bytes) else p[1] for p in self.parts)
+
+    def send(self, handler):
+        pace, client = handler.bandwidth.pace, handler.client_address[0]
+        for part in self.parts:
+            if isinstance(part, bytes):
+                view, start = memoryview(part), 0
+                for n in pace(client, len(part)):
+                    handler.wfile.write(view[start:start + n])
+                    start += n
+            else:
+                sendfile = hasattr(os, 'sendfile')
+                mapping = self.mapping() if self.mapping and not sendfile else None
+                offset, count = part
+                for n in pace(client, count):
+                    send_file_range(handler.connection, handler.wfile, self.file, offset, n, mapping=mapping)
+                    offset += n
+                    if sendfile:
+                        # Mapped slices go through wfile, which counts them itself.
+                        handler.bytes_sent += n
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def delay(self, n):
+        """Seconds until `n` tokens are available (after refill())."""
+        return 0.0 if self.tokens >= n else (n - self.tokens) / self.rate
+
+
+class BandwidthScheduler:
+    """Fair queuing of large response bodies under optional rate caps, in
+    bytes per second: `rate` for the whole server, `client_rate` per client
+    address.
+
+    Bodies over FAIR_THRESHOLD are sent in FAIR_CHUNK pieces. For each piece
+    the connection joins a FIFO ring and takes the first turn its client's
+    bucket and the global bucket can pay for, then rejoins at the back, so
+    active downloads take turns chunk by chunk and a client over its own cap
+    does not hold up anyone else. Smaller bodies go out at once but are
+    charged to the global bucket, which makes media streams yield to
+    interactive assets. Without caps every body is sent in one piece.
+    """
+
+    def __init__(self, rate=0, client_rate=0):
+        self.rate = rate
+        self.client_rate = client_rate
+        self.stats = {'chunks': 0, 'wait_seconds': 0.0}
+        self._global = TokenBucket(rate, max(FAIR_CHUNK, rate / 4)) if rate else None
+        self._clients = {}
+        self._ring = deque()
+        self._cond = threading.Condition()
+
+    def pace(self, client, total):
+        """Yield the sizes of the pieces to send of a `total`-byte body, each
+        once it may be sent."""
+        if not (self.rate or self.client_rate) or total <= FAIR_THRESHOLD:
+            if self._global is not None:
+                with self._cond:
+                    self._global.refill(time.monotonic())
+                    self._global.tokens -= total
+            yield total
+            return
+        with self._cond:
+            if client not in self._clients:
+                bucket = TokenBucket(self.client_rate, max(FAIR_CHUNK, self.client_rate / 4)) \
+                    if self.client_rate else None
+                self._clients[client] = [bucket, 0]
+            entry = self._clients[client]
+            entry[1] += 1
+        try:
+            while total > 0:
+                n = min(FAIR_CHUNK, total)
+                self._acquire(entry[0], n)
+                yield n
+                total -= n
+        finally:
+            with self._cond:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._clients[client]
+
+    def _acquire(self, bucket, n):
+        ticket = (bucket, n)
+        started = time.monotonic()
+        with self._cond:
+            self._ring.append(ticket)
+            self._cond.notify_all()
+            while True:
+                delay = self._turn_delay(ticket, time.monotonic())
+                if delay == 0:
+                    break
+                self._cond.wait(delay)
+            self._ring.remove(ticket)
+            for b in (bucket, self._global):
+                if b is not None:
+                    b.tokens -= n
+            self.stats['chunks'] += 1
+            self.stats['wait_seconds'] += time.monotonic() - started
+            self._cond.notify_all()
+
+    def _turn_delay(self, ticket, now):
+        """0 if `ticket` has the turn; otherwise how long to wait (None: until
+        another connection takes its turn)."""
+        if self._global is not None:
+            self._global.refill(now)
+        earliest = None
+        for waiting in self._ring:
+            bucket, n = waiting
+            delay = 0.0
+            for b in (bucket, self._global):
+                if b is not None:
+                    if b is bucket:
+                        b.refill(now)
+                    delay = max(delay, b.delay(n))
+            if delay == 0:
+                return 0 if waiting is ticket else None
+            earliest = delay if earliest is None else min(earliest, delay)
+        return earliest
+
+
+# =============================================================================
+# Asset Index & Caching Policy
+# =============================================================================
+
+def hash_file(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+Asset = namedtuple('Asset', 'digest etag path stamp')
+
+
+class AssetIndex:
+    """Content-addressed index of served files.
+
+    Each file is hashed once; the entry is only recomputed when the file's
+    size or mtime changes. Files with identical bytes resolve to one
+    canonical blob, so aliases share an ETag, an mmap, compressed variants
+    and a single copy in the page cache.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._blobs = {}
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def scan(self, root):
+        """Hash every file under `root` so aliases are known before the
+        first request."""
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if stat.S_ISREG(st.st_mode):
+                    self.lookup(path, st)
+
+    def lookup(self, path, st):
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None or entry[0] != stamp:
+            digest = hash_file(path)
+            with self._lock:
+                if entry is not None:
+                    self._maps.pop(entry[1], None)
+                self._entries[path] = (stamp, digest)
+                blob = self._blobs.get(digest)
+                if blob is None or self._entries.get(blob[0]) != (blob[1], digest):
+                    self._blobs[digest] = (path, stamp)
+        else:
+            digest = entry[1]
+        with self._lock:
+            canonical, canonical_stamp = self._blobs.get(digest, (path, stamp))
+        return Asset(digest, f'"{digest}"', canonical, canonical_stamp)
+
+    def mapping(self, asset):
+        """Return the shared read-only mmap for an asset's canonical blob."""
+        with self._lock:
+            mm = self._maps.get(asset.digest)
+            if mm is None and asset.stamp[1] > 0:
+                with open(asset.path, 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[asset.digest] = mm
+            return mm
+
+    def files(self):
+        with self._lock:
+            return [(path, digest, stamp[1]) for path, (stamp, digest) in self._entries.items()]
+
+    def duplicate_stats(self):
+        """Return (alias files, bytes not stored twice) across the index."""
+        seen = set()
+        files = duplicate_bytes = 0
+        for _, digest, size in self.files():
+            if digest in seen:
+                files += 1
+                duplicate_bytes += size
+            seen.add(digest)
+        return files, duplicate_bytes
+
+
+def cache_rule(ctype):
+    """Media never changes during a session; everything else revalidates."""
+    if ctype.startswith(('video/', 'image/')):
+        return 'immutable'
+    return 'revalidate'
+
+
+# =============================================================================
+# Precompressed Assets
+# =============================================================================
+
+def is_compressible(ctype):
+    """Text formats shrink well; video, images and zip containers don't."""
+    return ctype.startswith('text/') or ctype in COMPRESSIBLE_TYPES
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick the best encoding we can produce from an Accept-Encoding header."""
+    offered = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    candidates = [e for e in supported if offered.get(e, offered.get('*', 0)) > 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda e: offered.get(e, offered.get('*', 0)))
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class CompressionCache:
+    """Size-bounded LRU of compressed file payloads keyed by (content digest,
+    encoding).
+
+    Each variant is compressed once and shared by every path with the same
+    bytes; editing a file changes its digest, so stale variants simply age
+    out. Variants that come out no smaller than the original are remembered
+    as such so the file is served uncompressed.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_COMPRESS_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest, encoding, f, size):
+        key = (digest, encoding)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        payload = compress(f.read(), encoding)
+        if len(payload) >= size:
+            payload = None
+        self._store(key, payload)
+        return payload
+
+    def _store(self, key, payload):
+        size = len(payload) if payload else 0
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self.total_bytes -= len(old)
+            self._entries[key] = payload
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                if evicted:
+                    self.total_bytes -= len(evicted)
+
+    def warm(self, assets, extensions_map):
+        """Precompress every compressible file in the asset index at startup."""
+        encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        for path, digest, size in assets.files():
+            ctype = (extensions_map.get(os.path.splitext(path)[1].lower())
+                     or mimetypes.guess_type(path)[0] or '')
+            if size < MIN_COMPRESS_SIZE or not is_compressible(ctype):
+                continue
+            with open(path, 'rb') as f:
+                for encoding in encodings:
+                    f.seek(0)
+                    self.get(digest, encoding, f, size)
+
+
+# =============================================================================
+# Inference Proxy
+# =============================================================================
+
+UpstreamResponse = namedtuple('UpstreamResponse', 'status content_type body')
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def image_digest(image_url):
+    """Hash the decoded image bytes of a data URL (or the URL itself), so the
+    same frame hits the cache however it was encoded."""
+    header, sep, data = image_url.partition(',')
+    if sep and header.startswith('data:') and header.endswith(';base64'):
+        try:
+            return hashlib.blake2b(base64.b64decode(data), digest_size=16).hexdigest()
+        except binascii.Error:
+            raise APIError(HTTPStatus.BAD_REQUEST, 'image_url is not valid base64')
+    return hashlib.blake2b(image_url.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def inference_cache_key(endpoint, payload, image, auth=''):
+    """Key a request by (image hash, endpoint, prompt and other options, API
+    key), so one key's results are never served to another."""
+    options = {k: v for k, v in payload.items() if k not in ('image_url', 'stream')}
+    prompt = json.dumps(options, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(f'{endpoint}\0{image}\0{prompt}\0{auth}'.encode('utf-8'),
+                           digest_size=16).hexdigest()
+
+
+def sniff_image_type(data):
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[:4] == b'GIF8':
+        return 'image/gif'
+    return 'image/jpeg'
+
+
+def parse_multipart(body, boundary):
+    """Split a multipart/form-data body into {name: (content type, value)}.
+
+    Values are memoryview slices of `body`, so an uploaded frame is never
+    copied.
+    """
+    if not boundary:
+        raise APIError(HTTPStatus.BAD_REQUEST, 'multipart/form-data needs a boundary')
+    delimiter = b'--' + boundary.encode('latin-1')
+    view = memoryview(body)
+    fields = {}
+    pos = body.find(delimiter)
+    while pos != -1:
+        start = pos + len(delimiter)
+        if body[start:start + 2] == b'--':
+            break
+        header_end = body.find(b'\r\n\r\n', start)
+        end = body.find(b'\r\n' + delimiter, header_end + 4)
+        if header_end == -1 or end == -1:
+            raise APIError(HTTPStatus.BAD_REQUEST, 'Malformed multipart body')
+        headers = BytesHeaderParser().parsebytes(body[start:header_end].lstrip(b'\r\n'))
+        name = headers.get_param('name', header='content-disposition')
+        if name:
+            fields[name] = (headers.get_content_type(), view[header_end + 4:end])
+        pos = end + 2
+    return fields
+
+
+class ImagePayload:
+    """Upstream JSON body for a raw image upload.
+
+    The image is base64-encoded a chunk at a time while the body is sent, so
+    neither the data URL nor the full JSON document is ever built in memory.
+    """
+
+    def __init__(self, image, content_type, options):
+        self.image = image
+        self.options = options
+        self.digest = hashlib.blake2b(image, digest_size=16).hexdigest()
+        fields = json.dumps(dict(options, stream=False))[1:]
+        self._prefix = f'{{"image_url": "data:{content_type};base64,'.encode('ascii')
+        self._suffix = f'", {fields}'.encode('utf-8')
+
+    def __len__(self):
+        return len(self._prefix) + (len(self.image) + 2) // 3 * 4 + len(self._suffix)
+
+    def __iter__(self):
+        yield self._prefix
+        for i in range(0, len(self.image), BASE64_CHUNK):
+            yield base64.b64encode(self.image[i:i + BASE64_CHUNK])
+        yield self._suffix
+
+
+class HTTPUpstream:
+    """Forwards requests to a Moondream-compatible HTTP API, keeping one
+    keep-alive connection per worker thread."""
+
+    def __init__(self, base_url=DEFAULT_UPSTREAM, timeout=UPSTREAM_TIMEOUT):
+        parts = urllib.parse.urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = cls(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def request(self, endpoint, body, headers):
+        """POST `body` (bytes, or an ImagePayload streamed as it encodes)."""
+        path = f'{self.prefix}/v1/{endpoint}'
+        headers = dict(headers, **{'Content-Length': str(len(body))})
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request('POST', path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (ConnectionError, http.client.HTTPException) as e:
+                # A pooled keep-alive connection may have been closed upstream.
+                self._drop_connection()
+                if attempt:
+                    raise APIError(HTTPStatus.BAD_GATEWAY, f'Upstream error: {e}')
+                continue
+            except OSError as e:
+                self._drop_connection()
+                raise APIError(HTTPStatus.BAD_GATEWAY, f'Upstream error: {e}')
+            if response.will_close:
+                self._drop_connection()
+            return UpstreamResponse(response.status,
+                                    response.getheader('Content-Type', 'application/json'), data)
+
+
+class StubUpstream:
+    """Offline stand-in for the Moondream API with deterministic answers.
+
+    Useful for tests, benchmarks and demos without an API key. `delay` adds
+    simulated inference latency in seconds.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def request(self, endpoint, body, headers):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if isinstance(body, ImagePayload):
+            digest = body.digest
+        else:
+            try:
+                digest = image_digest(json.loads(body).get('image_url') or '')
+            except ValueError:
+                return UpstreamResponse(HTTPStatus.BAD_REQUEST, 'application/json', b'{"error": "invalid JSON"}')
+        seed = int(digest[:8], 16)
+        if endpoint == 'query':
+            result = {'answer': 'YES' if seed % 2 else 'NO'}
+        elif endpoint == 'caption':
+            result = {'caption': f'A stub scene #{seed % 1000}.'}
+        elif endpoint == 'detect':
+            x, y = (seed % 50) / 100, (seed // 50 % 50) / 100
+            result = {'objects': [{'x_min': x, 'y_min': y, 'x_max': round(x + 0.25, 2), 'y_max': round(y + 0.25, 2)}]}
+        else:
+            result = {'points': [{'x': (seed % 100) / 100, 'y': (seed // 100 % 100) / 100}]}
+        result['request_id'] = f'stub-{seed:08x}'
+        return UpstreamResponse(HTTPStatus.OK, 'application/json', json.dumps(result).encode('utf-8'))
+
+
+class ResultCache:
+    """Bounded LRU of successful inference responses, optionally persisted
+    one file per key under `directory`."""
+
+    def __init__(self, max_entries=DEFAULT_PROXY_CACHE_ENTRIES, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if not self.directory:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        self._remember(key, body)
+        return body
+
+    def put(self, key, body):
+        self._remember(key, body)
+        if self.directory:
+            tmp = f'{self._disk_path(key)}.{threading.get_ident()}.tmp'
+            try:
+                with open(tmp, 'wb') as f:
+                    f.write(body)
+                os.replace(tmp, self._disk_path(key))
+            except OSError:
+                # A full or unwritable cache directory only costs persistence.
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                return
+            self._prune_disk()
+
+    def _remember(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _prune_disk(self):
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith('.json')]
+            if len(names) <= self.max_entries:
+                return
+            paths = sorted((os.path.join(self.directory, n) for n in names), key=os.path.getmtime)
+        except OSError:
+            return
+        for path in paths[:len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, shareable=None):
+        """Return (result, shared) where `shared` is True for followers.
+
+        With `shareable`, followers only take a result it accepts; if the
+        leader failed or got anything else, each follower calls `fn` itself.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event()}
+        if not leader:
+            call['done'].wait()
+            if shareable is not None and not ('result' in call and shareable(call['result'])):
+                return fn(), False
+            if 'error' in call:
+                raise call['error']
+            return call['result'], True
+        try:
+            call['result'] = fn()
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+        return call['result'], False
+
+
+class InferenceProxy:
+    """Moondream-compatible /v1/* proxy with a result cache and single-flight
+    coalescing of identical in-flight requests."""
+
+    def __init__(self, upstream, cache):
+        self.upstream = upstream
+        self.cache = cache
+        self.flights = SingleFlight()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'uncached': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def handle(self, endpoint, body, headers):
+        """Return (UpstreamResponse, cache status) for a request body."""
+        if endpoint not in INFERENCE_ENDPOINTS:
+            raise APIError(HTTPStatus.NOT_FOUND, f'Unknown endpoint: {endpoint}')
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise APIError(HTTPStatus.BAD_REQUEST, 'Request body must be JSON')
+        if not isinstance(payload, dict):
+            raise APIError(HTTPStatus.BAD_REQUEST, 'Request body must be a JSON object')
+        for field in ('image_url', PROMPT_FIELDS.get(endpoint, 'question')):
+            if not isinstance(payload.get(field, ''), str):
+                raise APIError(HTTPStatus.BAD_REQUEST, f'"{field}" must be a string')
+        if payload.get('stream'):
+            self._count('uncached')
+            return self.upstream.request(endpoint, body, headers), 'BYPASS'
+        key = inference_cache_key(endpoint, payload, image_digest(payload.get('image_url') or ''),
+                                  headers.get('X-Moondream-Auth', ''))
+        return self._cached(key, endpoint, body, headers)
+
+    def handle_image(self, endpoint, image, content_type, options, headers):
+        """Like handle() for raw image bytes plus options. The request is only
+        converted to the upstream JSON format if the cache cannot answer it,
+        and then streamed rather than built in memory."""
+        if endpoint not in INFERENCE_ENDPOINTS:
+            raise APIError(HTTPStatus.NOT_FOUND, f'Unknown endpoint: {endpoint}')
+        if content_type not in UPLOAD_TYPES:
+            raise APIError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, f'Unsupported image type: {content_type}')
+        if not len(image):
+            raise APIError(HTTPStatus.BAD_REQUEST, 'Empty image')
+        options = {k: v for k, v in options.items() if k not in ('image_url', 'stream')}
+        payload = ImagePayload(image, content_type, options)
+        key = inference_cache_key(endpoint, options, payload.digest, headers.get('X-Moondream-Auth', ''))
+        return self._cached(key, endpoint, payload, headers)
+
+    def _cached(self, key, endpoint, body, headers):
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count('hits')
+            return UpstreamResponse(HTTPStatus.OK, 'application/json', cached), 'HIT'
+
+        def fetch():
+            response = self.upstream.request(endpoint, body, headers)
+            if response.status == HTTPStatus.OK:
+                self.cache.put(key, response.body)
+            return response
+
+        # Only successes are shared: a follower must not get the leader's 401 or 429.
+        response, shared = self.flights.do(key, fetch, lambda r: r.status == HTTPStatus.OK)
+        self._count('coalesced' if shared else 'misses')
+        return response, 'COALESCED' if shared else 'MISS'
+
+
+# =============================================================================
+# Video Frames
+# =============================================================================
+
+def split_jpegs(buffer):
+    """Split complete JPEGs off the front of an MJPEG byte stream.
+
+    Returns (frames, remainder) so callers can keep feeding partial reads.
+    """
+    frames = []
+    while True:
+        start = buffer.find(b'\xff\xd8')
+        if start < 0:
+            return frames, b''
+        end = buffer.find(b'\xff\xd9', start + 2)
+        if end < 0:
+            return frames, buffer[start:]
+        frames.append(buffer[start:end + 2])
+        buffer = buffer[end + 2:]
+
+
+def probe_video(path):
+    """Build a frame timestamp / keyframe index for a video with ffprobe."""
+    result = subprocess.run(
+        [FFPROBE, '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'format=start_time,duration:stream=width,height:packet=pts_time,flags',
+         '-of', 'json', path],
+        capture_output=True)
+    if result.returncode != 0:
+        raise APIError(HTTPStatus.UNPROCESSABLE_ENTITY,
+                       result.stderr.decode('utf-8', 'replace').strip() or 'Not a readable video')
+    info = json.loads(result.stdout)
+    start = float(info.get('format', {}).get('start_time') or 0)
+    packets = sorted(
+        (float(p['pts_time']) - start, 'K' in p.get('flags', ''))
+        for p in info.get('packets', []) if p.get('pts_time') not in (None, 'N/A'))
+    stream = (info.get('streams') or [{}])[0]
+    return {
+        'duration': float(info.get('format', {}).get('duration') or 0),
+        'width': stream.get('width'),
+        'height': stream.get('height'),
+        'frames': [round(t, 6) for t, _ in packets],
+        'keyframes': [i for i, (_, key) in enumerate(packets) if key],
+    }
+
+
+class FrameExtractor:
+    """Serves JPEG stills of videos at a timestamp and size.
+
+    A frame/keyframe index per video (keyed by content digest) is persisted
+    under `index_dir`, so seeking goes straight to the right GOP. Each decode
+    runs from the requested frame to the end of its GOP (at most `prefetch`
+    frames) and caches every frame it produced, so scrubbing and batch
+    evaluations rarely start ffmpeg twice for the same stretch of video.
+    """
+
+    def __init__(self, index_dir=DEFAULT_FRAME_INDEX_DIR, max_bytes=DEFAULT_FRAME_CACHE_MB * 1024 * 1024,
+                 prefetch=DEFAULT_FRAME_PREFETCH):
+        self.index_dir = index_dir
+        self.max_bytes = max_bytes
+        self.prefetch = prefetch
+        self.total_bytes = 0
+        self._indexes = {}
+        self._frames = OrderedDict()
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+
+    def index(self, path, asset):
+        with self._lock:
+            index = self._indexes.get(asset.digest)
+        if index is not None:
+            return index
+        index_path = os.path.join(self.index_dir, f'{asset.digest}.json')
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index, _ = self._flights.do(('index', asset.digest), lambda: probe_video(path))
+            os.makedirs(self.index_dir, exist_ok=True)
+            tmp = f'{index_path}.{threading.get_ident()}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp, index_path)
+        with self._lock:
+            self._indexes[asset.digest] = index
+        return index
+
+    def frame(self, path, asset, t, width=None, height=None, quality=80):
+        """Return (jpeg bytes, frame timestamp) for the frame shown at `t`."""
+        if not FFMPEG or not FFPROBE:
+            raise APIError(HTTPStatus.NOT_IMPLEMENTED, 'Frame extraction needs ffmpeg and ffprobe on PATH')
+        index = self.index(path, asset)
+        frames = index['frames']
+        if not frames:
+            raise APIError(HTTPStatus.UNPROCESSABLE_ENTITY, 'No video frames found')
+        i = max(bisect.bisect_right(frames, t) - 1, 0)
+        key = (asset.digest, width, height, quality)
+        with self._lock:
+            jpeg = self._frames.get(key + (i,))
+            if jpeg is not None:
+                self._frames.move_to_end(key + (i,))
+                return jpeg, frames[i]
+
+        keyframes = index['keyframes']
+        next_key = bisect.bisect_right(keyframes, i)
+        gop_end = keyframes[next_key] if next_key < len(keyframes) else len(frames)
+        count = max(1, min(gop_end - i, self.prefetch))
+        decoded, _ = self._flights.do(key + (i,), lambda: self._decode(
+            path, frames[i], count, width, height, quality))
+        if not decoded:
+            raise APIError(HTTPStatus.UNPROCESSABLE_ENTITY, f'Could not decode a frame at {t}s')
+        with self._lock:
+            for offset, jpeg in enumerate(decoded):
+                self._store(key + (i + offset,), jpeg)
+        return decoded[0], frames[i]
+
+    def _store(self, key, jpeg):
+        old = self._frames.pop(key, None)
+        if old is not None:
+            self.total_bytes -= len(old)
+        self._frames[key] = jpeg
+        self.total_bytes += len(jpeg)
+        while self.total_bytes > self.max_bytes and self._frames:
+            _, evicted = self._frames.popitem(last=False)
+            self.total_bytes -= len(evicted)
+
+    def _decode(self, path, start, count, width, height, quality):
+        # -ss before -i seeks to the preceding keyframe and decodes forward.
+        args = [FFMPEG, '-v', 'error', '-ss', f'{max(start - 0.0005, 0):.6f}', '-i', path,
+                '-frames:v', str(count), '-vsync', '0', '-an']
+        if width or height:
+            args += ['-vf', f'scale={width or -2}:{height or -2}']
+        args += ['-q:v', str(jpeg_qscale(quality)), '-f', 'image2pipe', '-c:v', 'mjpeg', '-']
+        result = subprocess.run(args, capture_output=True)
+        if result.returncode != 0:
+            raise APIError(HTTPStatus.UNPROCESSABLE_ENTITY,
+                           result.stderr.decode('utf-8', 'replace').strip() or 'ffmpeg failed')
+        decoded, _ = split_jpegs(result.stdout)
+        return decoded
+
+
+def jpeg_qscale(quality):
+    """Map a 1-100 JPEG quality to ffmpeg's 2 (best) - 31 (worst) qscale."""
+    quality = min(max(quality, 1), 100)
+    return round(2 + (100 - quality) * 29 / 99)
+
+
+# =============================================================================
+# WebSocket
+# =============================================================================
+
+def websocket_accept(key):
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode('ascii')).digest()).decode('ascii')
+
+
+def _ws_mask(data, key):
+    n = len(data)
+    if not n:
+        return b''
+    stream = int.from_bytes((key * (n // 4 + 1))[:n], 'big')
+    return (int.from_bytes(data, 'big') ^ stream).to_bytes(n, 'big')
+
+
+def accept_websocket(handler, protocols=()):
+    """Answer a WebSocket upgrade request on a BaseHTTPRequestHandler,
+    agreeing to the first of `protocols` the client offered."""
+    offered = [p.strip() for p in handler.headers.get('Sec-WebSocket-Protocol', '').split(',')]
+    handler.send_response(HTTPStatus.SWITCHING_PROTOCOLS)
+    handler.send_header('Upgrade', 'websocket')
+    handler.send_header('Connection', 'Upgrade')
+    handler.send_header('Sec-WebSocket-Accept', websocket_accept(handler.headers['Sec-WebSocket-Key']))
+    for protocol in protocols:
+        if protocol in offered:
+            handler.send_header('Sec-WebSocket-Protocol', protocol)
+            break
+    handler.end_headers()
+    handler.close_connection = True
+    handler.connection.settimeout(None)
+    return WebSocket(handler.rfile, handler.wfile)
+
+
+def websocket_connect(host, port, path='/', protocols=(), timeout=None):
+    """Open a client WebSocket; return (socket, WebSocket)."""
+    sock = socket.create_connection((host, port), timeout=timeout)
+    try:
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        lines = [f'GET {path} HTTP/1.1', f'Host: {host}:{port}', 'Upgrade: websocket',
+                 'Connection: Upgrade', f'Sec-WebSocket-Key: {key}', 'Sec-WebSocket-Version: 13']
+        if protocols:
+            lines.append(f'Sec-WebSocket-Protocol: {", ".join(protocols)}')
+        sock.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        rfile = sock.makefile('rb')
+        status = rfile.readline().split(None, 2)
+        headers = http.client.parse_headers(rfile)
+        if len(status) < 2 or status[1] != b'101' or headers.get('Sec-WebSocket-Accept') != websocket_accept(key):
+            raise ConnectionError(f'WebSocket upgrade refused by {host}:{port}')
+    except BaseException:
+        sock.close()
+        raise
+    return sock, WebSocket(rfile, sock.makefile('wb', buffering=0), client=True)
+
+
+class WebSocket:
+    """Minimal RFC 6455 framing over a connection's file objects.
+
+    Server-side sockets send unmasked frames; pass `client=True` when this
+    end opened the connection. Sends are serialised so a reader thread can
+    answer pings while another thread streams messages.
+    """
+    OP_CONT, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+    def __init__(self, rfile, wfile, client=False):
+        self.rfile = rfile
+        self.wfile = wfile
+        self.client = client
+        self.closed = False
+        self._send_lock = threading.Lock()
+
+    def send(self, message):
+        if isinstance(message, str):
+            self._send_frame(self.OP_TEXT, message.encode('utf-8'))
+        else:
+            self._send_frame(self.OP_BINARY, message)
+
+    def _send_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        mask_bit = 0x80 if self.client else 0
+        n = len(payload)
+        if n < 126:
+            header.append(mask_bit | n)
+        elif n < 65536:
+            header.append(mask_bit | 126)
+            header += struct.pack('!H', n)
+        else:
+            header.append(mask_bit | 127)
+            header += struct.pack('!Q', n)
+        if self.client:
+            key = os.urandom(4)
+            header += key
+            payload = _ws_mask(payload, key)
+        with self._send_lock:
+            self.wfile.write(bytes(header))
+            self.wfile.write(payload)
+
+    def _read_exact(self, n):
+        data = self.rfile.read(n)
+        if len(data) < n:
+            raise ConnectionError('WebSocket closed mid-frame')
+        return data
+
+    def recv(self):
+        """Return the next text (str) or binary (bytes) message, or None once
+        the connection is closed."""
+        message = bytearray()
+        message_opcode = None
+        try:
+            while True:
+                head = self._read_exact(2)
+                fin, opcode = head[0] & 0x80, head[0] & 0x0F
+                masked, n = head[1] & 0x80, head[1] & 0x7F
+                if n == 126:
+                    n = struct.unpack('!H', self._read_exact(2))[0]
+                elif n == 127:
+                    n = struct.unpack('!Q', self._read_exact(8))[0]
+                if n + len(message) > MAX_WS_MESSAGE:
+                    self.close(1009)
+                    return None
+                key = self._read_exact(4) if masked else None
+                payload = self._read_exact(n) if n else b''
+                if key:
+                    payload = _ws_mask(payload, key)
+                if opcode == self.OP_CLOSE:
+                    self.close(struct.unpack('!H', payload[:2])[0] if len(payload) >= 2 else 1000)
+                    return None
+                if opcode == self.OP_PING:
+                    self._send_frame(self.OP_PONG, payload)
+                    continue
+                if opcode == self.OP_PONG:
+                    continue
+                if opcode != self.OP_CONT:
+                    if fin:
+                        # Unfragmented: hand the payload over without reassembly.
+                        return payload.decode('utf-8') if opcode == self.OP_TEXT else payload
+                    message_opcode = opcode
+                    message = bytearray()
+                message += payload
+                if fin:
+                    if message_opcode == self.OP_TEXT:
+                        return message.decode('utf-8')
+                    return bytes(message)
+        except (OSError, ValueError):
+            self.closed = True
+            return None
+
+    def close(self, code=1000):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._send_frame(self.OP_CLOSE, struct.pack('!H', code))
+        except OSError:
+            pass
+
+
+# =============================================================================
+# Virtual Cameras
+# =============================================================================
+
+class FrameSubscriber:
+    """Holds only the newest undelivered frame, so a slow consumer skips
+    frames instead of queueing them or slowing the other subscribers."""
+
+    def __init__(self):
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+        self._frame = None
+        self._cond = threading.Condition()
+
+    def offer(self, frame):
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._cond.notify()
+
+    def next(self, timeout=STREAM_STALL_TIMEOUT):
+        """Block for the next frame; None when closed or stalled."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame is not None or self.closed, timeout)
+            frame, self._frame = self._frame, None
+        if frame is not None:
+            self.delivered += 1
+        return frame
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class VirtualCamera:
+    """Decodes one sample video in real time (looping) with a single ffmpeg
+    process and fans every JPEG out to all subscribers."""
+
+    def __init__(self, key, path, width, fps, quality):
+        self.key = key
+        self.path = path
+        self.width = width
+        self.fps = fps
+        self.quality = quality
+        self.frames = 0
+        self.subscribers = set()
+        self.process = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        filters = f'fps={self.fps}' + (f',scale={self.width}:-2' if self.width else '')
+        self.process = subprocess.Popen(
+            [FFMPEG, '-v', 'error', '-re', '-stream_loop', '-1', '-i', self.path, '-an',
+             '-vf', filters, '-q:v', str(jpeg_qscale(self.quality)), '-f', 'mjpeg', '-'],
+            stdout=subprocess.PIPE, stdin=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        threading.Thread(target=self._run, name=f'camera-{os.path.basename(self.path)}',
+                         daemon=True).start()
+
+    def _run(self):
+        buffer = b''
+        while True:
+            chunk = self.process.stdout.read1(65536)
+            if not chunk:
+                break
+            frames, buffer = split_jpegs(buffer + chunk)
+            for frame in frames:
+                self.frames += 1
+                with self._lock:
+                    subscribers = list(self.subscribers)
+                for subscriber in subscribers:
+                    subscriber.offer(frame)
+        self.process.wait()
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+
+    def add(self, subscriber):
+        with self._lock:
+            self.subscribers.add(subscriber)
+
+    def remove(self, subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+            return len(self.subscribers)
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+
+class CameraHub:
+    """One VirtualCamera per (video, width, fps, quality), started on the
+    first subscriber and stopped when the last one leaves."""
+
+    def __init__(self):
+        self.cameras = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, path, asset, width=None, fps=DEFAULT_STREAM_FPS, quality=70):
+        if not FFMPEG:
+            raise APIError(HTTPStatus.NOT_IMPLEMENTED, 'Video streaming needs ffmpeg on PATH')
+        key = (asset.digest, width, fps, quality)
+        subscriber = FrameSubscriber()
+        with self._lock:
+            camera = self.cameras.get(key)
+            if camera is None or camera.process.poll() is not None:
+                camera = self.cameras[key] = VirtualCamera(key, asset.path, width, fps, quality)
+                camera.start()
+            camera.add(subscriber)
+        return camera, subscriber
+
+    def unsubscribe(self, camera, subscriber):
+        subscriber.close()
+        with self._lock:
+            if camera.remove(subscriber) == 0 and self.cameras.get(camera.key) is camera:
+                del self.cameras[camera.key]
+                camera.stop()
+
+
+# =============================================================================
+# PTZ Proxy
+# =============================================================================
+
+def ptz_axis(path, query):
+    """Return the axis a PTZOptics CGI move command drives ('pantilt',
+    'zoom' or 'focus'), or None for commands that must not be coalesced."""
+    if not path.endswith('ptzctrl.cgi'):
+        return None
+    parts = query.lower().split('&')
+    if len(parts) < 2 or parts[0] not in ('ptzcmd', 'ptzctrl'):
+        return None
+    return PTZ_AXES.get(parts[1])
+
+
+class PTZCommand:
+    def __init__(self, target, headers):
+        self.target = target
+        self.headers = headers
+        self.created = time.monotonic()
+        self.response = None
+        self._done = threading.Event()
+
+    def finish(self, response):
+        self.response = response
+        self._done.set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.response
+
+
+class PTZCamera:
+    """Sends HTTP-CGI commands to one camera from a single sender thread over
+    a persistent keep-alive connection, at most `rate` commands per second.
+
+    While a move command waits its turn, a newer command for the same axis
+    replaces it (keeping its place in the queue), so a tracker nudging the
+    camera many times a second never builds a backlog. Other commands are
+    sent in order.
+    """
+
+    def __init__(self, address, rate=DEFAULT_PTZ_RATE, timeout=PTZ_TIMEOUT):
+        parts = urllib.parse.urlsplit(f'//{address}')
+        self.address = address
+        self.host = parts.hostname
+        self.port = parts.port
+        self.rate = rate
+        self.timeout = timeout
+        self.stats = {'received': 0, 'coalesced': 0, 'sent': 0, 'errors': 0}
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._conn = None
+        self._next_send = 0.0
+        threading.Thread(target=self._run, name=f'ptz-{address}', daemon=True).start()
+
+    def submit(self, target, headers, axis=None):
+        command = PTZCommand(target, headers)
+        with self._cond:
+            self.stats['received'] += 1
+            if axis is not None and axis in self._pending:
+                self.stats['coalesced'] += 1
+                self._pending[axis].finish(None)
+            self._pending[axis if axis is not None else command] = command
+            self._cond.notify()
+        return command
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Commands arriving during the rate-limit pause still coalesce.
+            delay = self._next_send - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            with self._cond:
+                _, command = self._pending.popitem(last=False)
+            self._next_send = time.monotonic() + 1 / self.rate
+            command.finish(self._send(command))
+
+    def _send(self, command):
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request('GET', command.target, headers=command.headers)
+                response = self._conn.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                self._conn.close()
+                self._conn = None
+                # Retry once: the camera may have closed an idle keep-alive connection.
+                if attempt or not isinstance(e, (ConnectionError, http.client.HTTPException)):
+                    self.stats['errors'] += 1
+                    return UpstreamResponse(HTTPStatus.BAD_GATEWAY, 'application/json',
+                                            json.dumps({'error': f'Camera error: {e}'}).encode('utf-8'))
+                continue
+            if response.will_close:
+                self._conn.close()
+                self._conn = None
+            self.stats['sent'] += 1
+            return UpstreamResponse(response.status, response.getheader('Content-Type', 'text/plain'), body)
+
+
+def is_lan_address(host):
+    """True for private IPv4/IPv6 literals other than loopback and link-local."""
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return ip.is_private and not (ip.is_loopback or ip.is_link_local or ip.is_unspecified)
+
+
+def is_loopback_host(host):
+    """True for 'localhost' and loopback IPv4/IPv6 literals."""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class PTZHub:
+    """One PTZCamera per camera address. `aliases` maps names such as
+    'fake' to an address.
+
+    Only the PTZOptics CGI paths in PTZ_PATHS are forwarded, and only to
+    hosts listed in `allowed` (--ptz-camera) or private LAN addresses, so
+    the proxy cannot be used to reach arbitrary URLs.
+    """
+
+    def __init__(self, rate=DEFAULT_PTZ_RATE, allowed=()):
+        self.rate = rate
+        self.allowed = set(allowed)
+        self.cameras = {}
+        self.aliases = {}
+        self._lock = threading.Lock()
+
+    def camera(self, name, path):
+        address = self.aliases.get(name, name)
+        try:
+            host = urllib.parse.urlsplit(f'//{address}').hostname
+        except ValueError:
+            host = None
+        if host is None:
+            raise APIError(HTTPStatus.BAD_REQUEST, f'Invalid camera address: {name}')
+        if name not in self.aliases:
+            # Simulated cameras (aliases) also answer /status.
+            if path not in PTZ_PATHS:
+                raise APIError(HTTPStatus.FORBIDDEN, f'Only {", ".join(PTZ_PATHS)} are forwarded')
+            if not (address in self.allowed or host in self.allowed or is_lan_address(host)):
+                raise APIError(HTTPStatus.FORBIDDEN,
+                               f'{name} is not a LAN address; allow it with --ptz-camera {name}')
+        with self._lock:
+            if address not in self.cameras:
+                self.cameras[address] = PTZCamera(address, self.rate)
+            return self.cameras[address]
+
+
+class FakePTZCamera:
+    """Stand-in for a PTZOptics camera's HTTP-CGI API, for tests and demos.
+
+    Move commands set pan/tilt/zoom speeds that integrate over time, and
+    every command is logged with its arrival time. GET /status returns the
+    position and recent commands as JSON. `latency` delays every reply.
+    """
+
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.pan = self.tilt = self.zoom = 0.0
+        self.velocity = [0, 0, 0]
+        self.presets = {}
+        self.commands = []
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _FakePTZHandler)
+        self.server.daemon_threads = True
+        self.server.camera = self
+        self.address = f'{host}:{self.server.server_port}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='fake-ptz', daemon=True).start()
+        return self
+
+    def _advance(self):
+        now = time.monotonic()
+        elapsed, self._updated = now - self._updated, now
+        self.pan += self.velocity[0] * elapsed
+        self.tilt += self.velocity[1] * elapsed
+        self.zoom = max(0.0, self.zoom + self.velocity[2] * elapsed)
+
+    def apply(self, query):
+        """Apply one ptzctrl.cgi query; return False if it is not understood."""
+        parts = query.split('&')
+        action = parts[1].lower() if len(parts) > 1 else ''
+        arg = parts[2] if len(parts) > 2 else ''
+        speed = int(arg) if arg.isdigit() else 5
+        with self._lock:
+            self._advance()
+            self.commands.append((time.time(), query))
+            if action in PTZ_DIRECTIONS:
+                self.velocity[0], self.velocity[1] = (d * speed for d in PTZ_DIRECTIONS[action])
+            elif action == 'ptzstop':
+                self.velocity[0] = self.velocity[1] = 0
+            elif action == 'home':
+                self.pan = self.tilt = 0.0
+                self.velocity[0] = self.velocity[1] = 0
+            elif action in ('zoomin', 'zoomout'):
+                self.velocity[2] = speed if action == 'zoomin' else -speed
+            elif action == 'zoomstop':
+                self.velocity[2] = 0
+            elif action == 'abszoom' and arg.isdigit():
+                self.zoom = float(arg)
+            elif action == 'posset' and arg:
+                self.presets[arg] = (self.pan, self.tilt, self.zoom)
+            elif action == 'poscall' and arg in self.presets:
+                self.pan, self.tilt, self.zoom = self.presets[arg]
+            else:
+                return False
+            return True
+
+    def status(self):
+        with self._lock:
+            self._advance()
+            return {'pan': round(self.pan, 3), 'tilt': round(self.tilt, 3), 'zoom': round(self.zoom, 3),
+                    'moving': any(self.velocity), 'commands': len(self.commands),
+                    'recent': [{'time': t, 'command': q} for t, q in self.commands[-20:]]}
+
+
+class _FakePTZHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        camera = self.server.camera
+        if camera.latency:
+            time.sleep(camera.latency)
+        path, _, query = self.path.partition('?')
+        if path == '/status':
+            body, ctype = json.dumps(camera.status()).encode('utf-8'), 'application/json'
+        elif path == '/cgi-bin/ptzctrl.cgi' and camera.apply(urllib.parse.unquote(query)):
+            body, ctype = b'OK', 'text/plain'
+        else:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# =============================================================================
+# OBS WebSocket Hub
+# =============================================================================
+
+def obs_auth(password, salt, challenge):
+    """obs-websocket v5 authentication string for a Hello challenge."""
+    secret = base64.b64encode(hashlib.sha256((password + salt).encode('utf-8')).digest()).decode('ascii')
+    return base64.b64encode(hashlib.sha256((secret + challenge).encode('utf-8')).digest()).decode('ascii')
+
+
+def obs_response(request_type, request_id, ok=True, data=None, code=None, comment=None):
+    status = {'result': ok, 'code': code or (100 if ok else 600)}
+    if comment:
+        status['comment'] = comment
+    d = {'requestType': request_type, 'requestId': request_id, 'requestStatus': status}
+    if data is not None:
+        d['responseData'] = data
+    return {'op': 7, 'd': d}
+
+
+def _send_json_message(ws, message):
+    try:
+        ws.send(json.dumps(message))
+    except OSError:
+        pass
+
+
+class OBSUpstream:
+    """One obs-websocket v5 connection shared by every playground client of
+    an OBS instance.
+
+    Read requests (OBS_CACHED_REQUESTS) are answered from a cache that OBS
+    events invalidate, and identical reads in flight are sent once. Writes
+    from all clients are sent as RequestBatch messages: one goes out as
+    soon as the connection is idle, and writes arriving while it runs are
+    queued for the next batch. A batch OBS does not answer within `timeout`
+    fails its writes, so later writes are not held back forever. Events are
+    forwarded to every client.
+    """
+
+    def __init__(self, address, password='', timeout=OBS_TIMEOUT):
+        parts = urllib.parse.urlsplit(f'//{address}')
+        self.address = address
+        self.timeout = timeout
+        self.sessions = set()
+        self.closed = False
+        self.stats = {'requests': 0, 'cache_hits': 0, 'batches': 0, 'batched_writes': 0}
+        self._cache = {}
+        self._epoch = 0
+        self._reads = {}
+        self._routes = {}
+        self._writes = []
+        self._batch_open = False
+        self._batch_timer = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._sock, self.ws = websocket_connect(parts.hostname, parts.port or OBS_DEFAULT_PORT, '/',
+                                                ('obswebsocket.json',), timeout)
+        try:
+            self.hello = self._identify(password)
+        except BaseException:
+            self._sock.close()
+            raise
+        self._sock.settimeout(None)
+        threading.Thread(target=self._read_loop, name=f'obs-{address}', daemon=True).start()
+
+    def _identify(self, password):
+        message = self.ws.recv()
+        hello = json.loads(message)['d'] if isinstance(message, str) else None
+        if hello is None:
+            raise APIError(HTTPStatus.BAD_GATEWAY, 'OBS did not send Hello')
+        identify = {'rpcVersion': 1}
+        if 'authentication' in hello:
+            auth = hello['authentication']
+            identify['authentication'] = obs_auth(password, auth['salt'], auth['challenge'])
+        self.ws.send(json.dumps({'op': 1, 'd': identify}))
+        message = self.ws.recv()
+        if not isinstance(message, str) or json.loads(message).get('op') != 2:
+            raise APIError(HTTPStatus.UNAUTHORIZED, 'OBS authentication failed')
+        return hello
+
+    def attach(self, ws):
+        with self._lock:
+            if self.closed:
+                return False
+            self.sessions.add(ws)
+            return True
+
+    def detach(self, ws):
+        with self._lock:
+            self.sessions.discard(ws)
+
+    def _id(self):
+        self._next_id += 1
+        return f'hub-{self._next_id}'
+
+    def request(self, ws, d):
+        """Handle a client's Request (op 6) message data."""
+        request_type = d.get('requestType')
+        request_id = d.get('requestId')
+        data = d.get('requestData') or {}
+        with self._lock:
+            self.stats['requests'] += 1
+            if request_type in OBS_CACHED_REQUESTS:
+                key = (request_type, json.dumps(data, sort_keys=True))
+                if key in self._cache:
+                    self.stats['cache_hits'] += 1
+                    response = obs_response(request_type, request_id, data=self._cache[key])
+                elif key in self._reads:
+                    self.stats['cache_hits'] += 1
+                    self._reads[key].append((ws, request_id))
+                    return
+                else:
+                    self._reads[key] = [(ws, request_id)]
+                    upstream_id = self._id()
+                    self._routes[upstream_id] = ('read', key, self._epoch)
+                    response = None
+            else:
+                self._writes.append((ws, request_id, request_type, data))
+                if self._batch_open:
+                    return
+                batch = self._take_batch()
+        if request_type in OBS_CACHED_REQUESTS:
+            if response is not None:
+                _send_json_message(ws, response)
+            else:
+                self._send({'op': 6, 'd': {'requestType': request_type, 'requestId': upstream_id,
+                                           'requestData': data}})
+        else:
+            self._send(batch)
+
+    def request_batch(self, ws, d):
+        """Forward a client's own RequestBatch (op 8) as one batch."""
+        with self._lock:
+            self.stats['requests'] += 1
+            upstream_id = self._id()
+            self._routes[upstream_id] = ('client-batch', ws, d.get('requestId'))
+        self._send({'op': 8, 'd': dict(d, requestId=upstream_id)})
+
+    def _take_batch(self):
+        # Called with the lock held.
+        writes, self._writes = self._writes, []
+        self._batch_open = True
+        self.stats['batches'] += 1
+        self.stats['batched_writes'] += len(writes)
+        requests = []
+        for ws, request_id, request_type, data in writes:
+            upstream_id = self._id()
+            self._routes[upstream_id] = ('write', ws, request_id, request_type)
+            requests.append({'requestType': request_type, 'requestId': upstream_id, 'requestData': data})
+        batch_id = self._id()
+        self._routes[batch_id] = ('batch', [r['requestId'] for r in requests])
+        self._batch_timer = threading.Timer(self.timeout, self._batch_expired, (batch_id,))
+        self._batch_timer.daemon = True
+        self._batch_timer.start()
+        return {'op': 8, 'd': {'requestId': batch_id, 'haltOnFailure': False, 'executionType': 0,
+                               'requests': requests}}
+
+    def _send(self, message):
+        try:
+            self.ws.send(json.dumps(message))
+        except OSError:
+            self.close()
+
+    def _read_loop(self):
+        while (message := self.ws.recv()) is not None:
+            try:
+                message = json.loads(message)
+                op, d = message['op'], message['d']
+            except (TypeError, ValueError, KeyError):
+                continue
+            if op == 5:
+                self._on_event(message)
+            elif op == 7:
+                self._on_response(d)
+            elif op == 9:
+                self._on_batch_response(d)
+        self.close()
+
+    def _invalidate(self, request_types=None):
+        # Called with the lock held.
+        self._epoch += 1
+        if request_types is None:
+            self._cache.clear()
+        else:
+            for key in [k for k in self._cache if k[0] in request_types]:
+                del self._cache[key]
+
+    def _on_event(self, message):
+        event_type = message['d'].get('eventType')
+        with self._lock:
+            if event_type in OBS_EVENT_INVALIDATES:
+                self._invalidate(OBS_EVENT_INVALIDATES[event_type])
+            sessions = list(self.sessions)
+        text = json.dumps(message)
+        for ws in sessions:
+            try:
+                ws.send(text)
+            except OSError:
+                pass
+
+    def _on_response(self, d):
+        with self._lock:
+            route = self._routes.pop(d.get('requestId'), None)
+            if route is None or route[0] != 'read':
+                return
+            _, key, epoch = route
+            waiters = self._reads.pop(key, [])
+            ok = d.get('requestStatus', {}).get('result')
+            if ok and epoch == self._epoch:
+                self._cache[key] = d.get('responseData')
+        for ws, request_id in waiters:
+            _send_json_message(ws, {'op': 7, 'd': dict(d, requestId=request_id)})
+
+    def _on_batch_response(self, d):
+        with self._lock:
+            route = self._routes.pop(d.get('requestId'), None)
+            if route is None:
+                return
+            self._invalidate()
+            replies = []
+            if route[0] == 'client-batch':
+                replies.append((route[1], {'op': 9, 'd': dict(d, requestId=route[2])}))
+            for result in d.get('results', []) if route[0] == 'batch' else ():
+                write = self._routes.pop(result.get('requestId'), None)
+                if write is not None:
+                    replies.append((write[1], {'op': 7, 'd': dict(result, requestId=write[2])}))
+            batch = self._next_batch() if route[0] == 'batch' else None
+        for ws, reply in replies:
+            _send_json_message(ws, reply)
+        if batch is not None:
+            self._send(batch)
+
+    def _batch_expired(self, batch_id):
+        with self._lock:
+            route = self._routes.pop(batch_id, None)
+            if route is None or self.closed:
+                return
+            # The writes may still have run; do not trust the cache.
+            self._invalidate()
+            replies = []
+            for upstream_id in route[1]:
+                write = self._routes.pop(upstream_id, None)
+                if write is not None:
+                    replies.append((write[1], obs_response(write[3], write[2], ok=False,
+                                                           comment='OBS did not answer in time')))
+            batch = self._next_batch()
+        for ws, reply in replies:
+            _send_json_message(ws, reply)
+        if batch is not None:
+            self._send(batch)
+
+    def _next_batch(self):
+        # Called with the lock held, once the open batch is answered or expired.
+        self._batch_timer.cancel()
+        if self._writes:
+            return self._take_batch()
+        self._batch_open = False
+        return None
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            sessions = list(self.sessions)
+            if self._batch_timer is not None:
+                self._batch_timer.cancel()
+        self.ws.close()
+        self._sock.close()
+        for ws in sessions:
+            ws.close(1011)
+
+
+class OBSHub:
+    """One OBSUpstream per (OBS address, password). `aliases` maps names
+    such as 'fake' to an address.
+
+    Like PTZHub, it only connects to hosts listed in `allowed` (--obs-host),
+    private LAN addresses or OBS's default port on this machine, so the
+    proxy cannot be used as a WebSocket relay to arbitrary hosts.
+    """
+
+    def __init__(self, allowed=()):
+        self.allowed = set(allowed)
+        self.connections = {}
+        self.aliases = {}
+        self._lock = threading.Lock()
+
+    def connect(self, name, password=''):
+        address = self.aliases.get(name, name or f'localhost:{OBS_DEFAULT_PORT}')
+        try:
+            parts = urllib.parse.urlsplit(f'//{address}')
+            host, port = parts.hostname, parts.port or OBS_DEFAULT_PORT
+        except ValueError:
+            host = None
+        if host is None:
+            raise APIError(HTTPStatus.BAD_REQUEST, f'Invalid OBS address: {name}')
+        if name not in self.aliases and not (
+                address in self.allowed or host in self.allowed or is_lan_address(host)
+                or (is_loopback_host(host) and port == OBS_DEFAULT_PORT)):
+            raise APIError(HTTPStatus.FORBIDDEN,
+                           f'{name} is not a LAN address; allow it with --obs-host {name}')
+        key = (address, password)
+        with self._lock:
+            upstream = self.connections.get(key)
+            if upstream is None or upstream.closed:
+                try:
+                    upstream = OBSUpstream(address, password)
+                except OSError as e:
+                    raise APIError(HTTPStatus.BAD_GATEWAY, f'Cannot reach OBS at {address}: {e}')
+                self.connections[key] = upstream
+            return upstream
+
+
+class FakeOBS:
+    """Stand-in obs-websocket v5 server for tests and demos, with a few
+    scenes, scene switching (and its event), stream/record toggles and
+    RequestBatch support. `requests` counts received requests by type and
+    `batches` counts RequestBatch messages."""
+
+    def __init__(self, password='', scenes=('Camera', 'Screen', 'BRB'), host='127.0.0.1', port=0):
+        self.password = password
+        self.scenes = list(scenes)
+        self.program_scene = self.scenes[0]
+        self.streaming = self.recording = False
+        self.requests = {}
+        self.batches = 0
+        self.sessions = set()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _FakeOBSHandler)
+        self.server.daemon_threads = True
+        self.server.obs = self
+        self.address = f'{host}:{self.server.server_port}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='fake-obs', daemon=True).start()
+        return self
+
+    def hello(self):
+        d = {'obsWebSocketVersion': '5.0.0-fake', 'rpcVersion': 1}
+        if self.password:
+            d['authentication'] = {'challenge': uuid.uuid4().hex, 'salt': uuid.uuid4().hex}
+        return d
+
+    def broadcast(self, event_type, data):
+        message = json.dumps({'op': 5, 'd': {'eventType': event_type, 'eventIntent': 1, 'eventData': data}})
+        for ws in list(self.sessions):
+            try:
+                ws.send(message)
+            except OSError:
+                pass
+
+    def execute(self, request_type, data):
+        """Run one request; return (ok, response data or error comment)."""
+        with self._lock:
+            self.requests[request_type] = self.requests.get(request_type, 0) + 1
+            if request_type == 'GetVersion':
+                return True, {'obsVersion': '30.0.0', 'obsWebSocketVersion': '5.0.0-fake', 'rpcVersion': 1}
+            if request_type == 'GetSceneList':
+                scenes = [{'sceneIndex': i, 'sceneName': name} for i, name in enumerate(reversed(self.scenes))]
+                return True, {'currentProgramSceneName': self.program_scene,
+                              'currentPreviewSceneName': None, 'scenes': scenes}
+            if request_type == 'GetCurrentProgramScene':
+                return True, {'currentProgramSceneName': self.program_scene, 'sceneName': self.program_scene}
+            if request_type in ('GetStreamStatus', 'GetRecordStatus'):
+                return True, {'outputActive': self.streaming if 'Stream' in request_type else self.recording}
+            if request_type in ('StartStream', 'StopStream', 'ToggleStream'):
+                self.streaming = request_type == 'StartStream' or (request_type == 'ToggleStream'
+                                                                   and not self.streaming)
+                return True, {'outputActive': self.streaming}
+            if request_type in ('StartRecord', 'StopRecord', 'ToggleRecord'):
+                self.recording = request_type == 'StartRecord' or (request_type == 'ToggleRecord'
+                                                                   and not self.recording)
+                return True, {'outputActive': self.recording}
+            if request_type != 'SetCurrentProgramScene':
+                return False, f'Your request type is not valid: {request_type}'
+            if data.get('sceneName') not in self.scenes:
+                return False, 'No source was found by the name of `sceneName`.'
+            changed = self.program_scene != data['sceneName']
+            self.program_scene = data['sceneName']
+        if changed:
+            self.broadcast('CurrentProgramSceneChanged', {'sceneName': self.program_scene})
+        return True, None
+
+
+class _FakeOBSHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        obs = self.server.obs
+        if self.headers.get('Upgrade', '').lower() != 'websocket':
+            self.send_error(HTTPStatus.BAD_REQUEST)
+            return
+        ws = accept_websocket(self, ('obswebsocket.json',))
+        hello = obs.hello()
+        ws.send(json.dumps({'op': 0, 'd': hello}))
+        message = ws.recv()
+        identify = json.loads(message).get('d', {}) if isinstance(message, str) else None
+        if identify is None:
+            return
+        if obs.password:
+            auth = hello['authentication']
+            if identify.get('authentication') != obs_auth(obs.password, auth['salt'], auth['challenge']):
+                ws.close(4009)
+                return
+        ws.send(json.dumps({'op': 2, 'd': {'negotiatedRpcVersion': 1}}))
+        obs.sessions.add(ws)
+        try:
+            while (message := ws.recv()) is not None:
+                try:
+                    message = json.loads(message)
+                    op, d = message['op'], message['d']
+                except (TypeError, ValueError, KeyError):
+                    continue
+                if op == 6:
+                    ok, result = obs.execute(d['requestType'], d.get('requestData') or {})
+                    ws.send(json.dumps(obs_response(d['requestType'], d['requestId'], ok,
+                                                    result if ok else None, comment=None if ok else result)))
+                elif op == 8:
+                    obs.batches += 1
+                    results = []
+                    for request in d.get('requests', []):
+                        ok, result = obs.execute(request['requestType'], request.get('requestData') or {})
+                        results.append(obs_response(request['requestType'], request.get('requestId'), ok,
+                                                    result if ok else None,
+                                                    comment=None if ok else result)['d'])
+                    ws.send(json.dumps({'op': 9, 'd': {'requestId': d['requestId'], 'results': results}}))
+        finally:
+            obs.sessions.discard(ws)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# =============================================================================
+# Result Bus
+# =============================================================================
+
+BusEvent = namedtuple('BusEvent', 'id topic data message')
+
+
+def valid_topic(topic):
+    return 0 < len(topic) <= 128 and all(c.isalnum() or c in '-_./:' for c in topic)
+
+
+def bus_payload(body):
+    """Re-encode a published JSON body on one line (SSE data cannot span
+    lines); raise APIError 400 if it is not JSON."""
+    try:
+        return json.dumps(json.loads(body), separators=(',', ':'))
+    except ValueError:
+        raise APIError(HTTPStatus.BAD_REQUEST, 'Published data must be JSON')
+
+
+class BusSubscriber:
+    """Events waiting for one consumer. A consumer more than `max_pending`
+    events behind loses the oldest ones (counted in `dropped`)."""
+
+    def __init__(self, topics, max_pending=BUS_SUBSCRIBER_QUEUE):
+        self.topics = topics
+        self.dropped = 0
+        self.closed = False
+        self._events = deque(maxlen=max_pending)
+        self._cond = threading.Condition()
+
+    def offer(self, event):
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._cond.notify()
+
+    def next(self, timeout=BUS_HEARTBEAT):
+        """Block for the next event; None on timeout or once closed."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._events or self.closed, timeout)
+            if self._events and not self.closed:
+                return self._events.popleft()
+        return None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class ResultBus:
+    """Topic-based publish/subscribe for detection and caption results, so
+    one producer per camera can feed any number of tools.
+
+    Each topic keeps its last `replay` events for late subscribers. Event
+    ids increase across all topics, which lets an SSE client resume from
+    Last-Event-ID.
+    """
+
+    def __init__(self, replay=DEFAULT_BUS_REPLAY):
+        self.replay = replay
+        self.published = 0
+        self.subscribers = {}
+        self._history = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def publish(self, topic, data):
+        """Publish JSON text `data`; return (event, number of subscribers)."""
+        with self._lock:
+            self._next_id += 1
+            self.published += 1
+            message = (f'{{"id":{self._next_id},"topic":{json.dumps(topic)},'
+                       f'"time":{time.time():.3f},"data":{data}}}')
+            event = BusEvent(self._next_id, topic, data, message)
+            if topic not in self._history:
+                self._history[topic] = deque(maxlen=self.replay)
+            self._history[topic].append(event)
+            subscribers = list(self.subscribers.get(topic, ()))
+        for subscriber in subscribers:
+            subscriber.offer(event)
+        return event, len(subscribers)
+
+    def subscribe(self, topics, replay=None, after=0):
+        """Subscribe to `topics`, first queueing the last `replay` events of
+        each (default: all kept) with an id above `after`."""
+        subscriber = BusSubscriber(topics)
+        with self._lock:
+            backlog = []
+            for topic in topics:
+                events = [e for e in self._history.get(topic, ()) if e.id > after]
+                backlog += events[len(events) - replay:] if replay is not None and replay < len(events) else events
+            for event in sorted(backlog):
+                subscriber.offer(event)
+            for topic in topics:
+                self.subscribers.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            for topic in subscriber.topics:
+                subscribers = self.subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self.subscribers[topic]
+        subscriber.close()
+
+
+# =============================================================================
+# Metrics & Access Log
+# =============================================================================
+
+def _labels(names, values):
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        counts = self.series.setdefault(labels, [0] * (len(self.buckets) + 2))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+
+class Metrics:
+    """Request counters and latency histograms for one process.
+
+    snapshot() returns a JSON-serialisable copy so several worker processes
+    can be merged (merge_snapshots) before rendering in the Prometheus text
+    exposition format (render_metrics).
+    """
+
+    def __init__(self):
+        self.requests = {}
+        self.bytes_sent = {}
+        self.ttfb = Histogram()
+        self.duration = Histogram()
+        self.connections_open = 0
+        self.connections_total = 0
+        self.requests_in_flight = 0
+        self._lock = threading.Lock()
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections_open += 1
+            self.connections_total += 1
+
+    def connection_closed(self):
+        with self._lock:
+            self.connections_open -= 1
+
+    def request_started(self):
+        with self._lock:
+            self.requests_in_flight += 1
+
+    def request_finished(self, route, ext, method, status, nbytes, ttfb, duration):
+        # No method for a malformed request line, no status when the handler
+        # failed or the client left before the response: keep labels sortable.
+        key = (route, ext, method or '-', str(status or '-'))
+        with self._lock:
+            self.requests_in_flight -= 1
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.bytes_sent[key] = self.bytes_sent.get(key, 0) + nbytes
+            if ttfb is not None:
+                self.ttfb.observe((route, ext), ttfb)
+            self.duration.observe((route, ext), duration)
+
+    def snapshot(self, extra=()):
+        with self._lock:
+            return {
+                'requests': [list(k) + [v] for k, v in self.requests.items()],
+                'bytes': [list(k) + [v] for k, v in self.bytes_sent.items()],
+                'ttfb': [list(k) + list(v) for k, v in self.ttfb.series.items()],
+                'duration': [list(k) + list(v) for k, v in self.duration.series.items()],
+                'scalars': [
+                    ['playground_connections_open', 'gauge', 'Client connections currently open.',
+                     self.connections_open],
+                    ['playground_connections_total', 'counter', 'Client connections accepted.',
+                     self.connections_total],
+                    ['playground_requests_in_flight', 'gauge', 'Requests currently being served.',
+                     self.requests_in_flight],
+                ] + [list(item) for item in extra],
+            }
+
+    def render(self, extra=()):
+        return render_metrics(self.snapshot(extra))
+
+
+def merge_snapshots(snapshots):
+    """Combine per-process snapshots: counters, histograms and most gauges
+    add up; SHARED_SCALARS describe state every worker shares, so the
+    largest value wins."""
+    merged = {'requests': {}, 'bytes': {}, 'ttfb': {}, 'duration': {}, 'scalars': {}}
+    for snapshot in snapshots:
+        for section, width in (('requests', 4), ('bytes', 4), ('ttfb', 2), ('duration', 2)):
+            for row in snapshot.get(section, []):
+                key, values = tuple(row[:width]), row[width:]
+                current = merged[section].get(key)
+                merged[section][key] = values if current is None else [a + b for a, b in zip(current, values)]
+        for name, kind, help_text, value in snapshot.get('scalars', []):
+            current = merged['scalars'].get(name)
+            if current is not None:
+                value = max(current[2], value) if name in SHARED_SCALARS else current[2] + value
+            merged['scalars'][name] = (kind, help_text, value)
+    return {
+        'requests': [list(k) + [v[0]] for k, v in merged['requests'].items()],
+        'bytes': [list(k) + [v[0]] for k, v in merged['bytes'].items()],
+        'ttfb': [list(k) + v for k, v in merged['ttfb'].items()],
+        'duration': [list(k) + v for k, v in merged['duration'].items()],
+        'scalars': [[name, kind, help_text, value] for name, (kind, help_text, value) in merged['scalars'].items()],
+    }
+
+
+def _render_histogram(name, rows):
+    lines = []
+    for row in sorted(rows):
+        base = _labels(METRIC_TIMING_LABELS, row[:2])
+        counts = row[2:]
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{base}}} {counts[-1]:.6f}')
+        lines.append(f'{name}_count{{{base}}} {cumulative}')
+    return lines
+
+
+def render_metrics(snapshot):
+    lines = [
+        '# HELP playground_requests_total HTTP requests served.',
+        '# TYPE playground_requests_total counter',
+    ]
+    lines += [f'playground_requests_total{{{_labels(METRIC_LABELS, row[:4])}}} {row[4]}'
+              for row in sorted(snapshot['requests'])]
+    lines += [
+        '# HELP playground_response_bytes_total Bytes written to clients, headers included.',
+        '# TYPE playground_response_bytes_total counter',
+    ]
+    lines += [f'playground_response_bytes_total{{{_labels(METRIC_LABELS, row[:4])}}} {row[4]}'
+              for row in sorted(snapshot['bytes'])]
+    lines += [
+        '# HELP playground_time_to_first_byte_seconds Time from request line to response headers.',
+        '# TYPE playground_time_to_first_byte_seconds histogram',
+    ]
+    lines += _render_histogram('playground_time_to_first_byte_seconds', snapshot['ttfb'])
+    lines += [
+        '# HELP playground_request_duration_seconds Time from request line to last body byte.',
+        '# TYPE playground_request_duration_seconds histogram',
+    ]
+    lines += _render_histogram('playground_request_duration_seconds', snapshot['duration'])
+    for name, kind, help_text, value in snapshot['scalars']:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+    return '\n'.join(lines) + '\n'
+
+
+class AccessLog:
+    """Writes access log lines from a background thread so requests never
+    block on stderr. Lines are dropped (and counted) if the writer falls
+    behind by more than `max_pending` lines."""
+
+    def __init__(self, stream=sys.stderr, max_pending=ACCESS_LOG_QUEUE):
+        self.stream = stream
+        self.dropped = 0
+        self._queue = queue.Queue(max_pending)
+        threading.Thread(target=self._run, name='access-log', daemon=True).start()
+
+    def write(self, line):
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            lines = [self._queue.get()]
+            while len(lines) < 512:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.stream.write(''.join(lines))
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass
+
+
+class StreamSlots:
+    """Counts long-lived responses (MJPEG, server-sent events, WebSockets).
+    Each runs on its own thread rather than a pool worker, up to `limit`."""
+
+    def __init__(self, limit=DEFAULT_MAX_STREAMS):
+        self.limit = limit
+        self.open = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.open >= self.limit:
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+
+class _CountingWriter:
+    """Wraps a handler's wfile to count bytes written."""
+
+    def __init__(self, raw, handler):
+        self.raw = raw
+        self.handler = handler
+
+    def write(self, data):
+        n = self.raw.write(data)
+        self.handler.bytes_sent += len(data)
+        return n
+
+    def flush(self):
+        self.raw.flush()
+
+    def close(self):
+        self.raw.close()
+
+    @property
+    def closed(self):
+        return self.raw.closed
+
 
 class CORSRequestHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    timeout = DEFAULT_KEEPALIVE
+    assets = AssetIndex()
+    compression = CompressionCache()
+    bandwidth = BandwidthScheduler()
+    media_max_age = DEFAULT_MEDIA_MAX_AGE
+    cache_control = NO_STORE
+    inference = InferenceProxy(HTTPUpstream(), ResultCache())
+    frames = FrameExtractor()
+    cameras = CameraHub()
+    ptz = PTZHub()
+    obs = OBSHub()
+    bus = ResultBus()
+    streams = StreamSlots()
+    metrics = Metrics()
+    metrics_snapshots = None
+    access_log = None           # an AccessLog, set by make_server()
+    api_routes = [
+        ('GET', '/metrics', 'handle_metrics'),
+        ('POST', '/v1/', 'handle_inference'),
+        ('GET', '/v1/', 'handle_inference_socket'),
+        ('GET', '/frames/', 'handle_frame'),
+        ('GET', '/stream/', 'handle_stream'),
+        ('GET', '/ptz/', 'handle_ptz'),
+        ('GET', '/obs/', 'handle_obs'),
+        ('GET', '/bus/', 'handle_bus_subscribe'),
+        ('POST', '/bus/', 'handle_bus_publish'),
+    ]
+    route = 'static'
+    status = None
+    bytes_sent = 0
+    first_byte_at = None
+    detached = False
+
+    def setup(self):
+        super().setup()
+        self.wfile = _CountingWriter(self.wfile, self)
+
+    def finish(self):
+        if not self.detached:
+            super().finish()
+
+    def handle_one_request(self):
+        self.started_at = None
+        try:
+            super().handle_one_request()
+        finally:
+            if not self.detached:
+                self.record_request()
+
+    def record_request(self):
+        # Every request counted in flight by parse_request is finished here.
+        if self.started_at is None:
+            return
+        started, self.started_at = self.started_at, None
+        ext = ''
+        try:
+            ext = self.metrics_ext()
+        finally:
+            ttfb = self.first_byte_at - started if self.first_byte_at else None
+            self.metrics.request_finished(self.route, ext, self.command, self.status,
+                                          self.bytes_sent, ttfb, time.perf_counter() - started)
+
+    def detach(self, target, *args):
+        """Serve a long-lived response (MJPEG, server-sent events, a
+        WebSocket) by calling target(*args) on its own thread, so it does not
+        hold a pool worker. The engine leaves the connection to that thread,
+        which closes it. Answers 503 once `streams.limit` are open."""
+        if not self.streams.acquire():
+            self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {'error': 'Too many open streams'})
+            return
+        self.detached = True
+        self.close_connection = True
+        threading.Thread(target=self._serve_detached, args=(target, args), daemon=True,
+                         name='playground-stream').start()
+
+    def _serve_detached(self, target, args):
+        try:
+            target(*args)
+        except Exception:
+            self.server.handle_error(self.request, self.client_address)
+        finally:
+            self.streams.release()
+            self.record_request()
+            super().finish()
+            self.server.shutdown_request(self.request)
+
+    def parse_request(self):
+        self.started_at = time.perf_counter()
+        self.first_byte_at = None
+        self.bytes_sent = 0
+        self.status = None
+        self.route = 'static'
+        self.metrics.request_started()
+        return super().parse_request()
+
+    def metrics_ext(self):
+        """File extension label for static requests, bounded to known types."""
+        if self.route != 'static':
+            return ''
+        # A malformed request line leaves no path.
+        ext = os.path.splitext(urllib.parse.urlsplit(getattr(self, 'path', '')).path)[1].lower()
+        if not ext:
+            return ''
+        return ext if ext in self.extensions_map or ext in mimetypes.types_map else 'other'
+
+    def send_response(self, code, message=None):
+        self.cache_control = NO_STORE
+        self.status = int(code)
+        super().send_response(code, message)
+
+    def flush_headers(self):
+        if self.first_byte_at is None:
+            self.first_byte_at = time.perf_counter()
+        super().flush_headers()
+
+    def log_error(self, format, *args):
+        # An idle keep-alive connection reaching its timeout is not an error.
+        if not format.startswith('Request timed out'):
+            super().log_error(format, *args)
+
+    def log_request(self, code='-', size='-'):
+        # Query strings can carry secrets, so only the path is logged.
+        if isinstance(code, HTTPStatus):
+            code = code.value
+        method, _, rest = self.requestline.partition(' ')
+        target, _, version = rest.partition(' ')
+        requestline = ' '.join(filter(None, (method, target.partition('?')[0], version)))
+        self.log_message('"%s" %s %s', requestline, str(code), str(size))
+
+    def log_message(self, format, *args):
+        if self.access_log is not None:
+            self.access_log.write('%s - - [%s] %s\n' % (
+                self.address_string(), self.log_date_time_string(), format % args))
+
     def end_headers(self):
+        if (not self.close_connection and self.status != HTTPStatus.SWITCHING_PROTOCOLS
+                and not getattr(self.server, 'parks_idle_connections', False)):
+            # The single engine serves one connection at a time: an idle
+            # keep-alive client would block everyone else.
+            self.send_header('Connection', 'close')
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', '*')
-        self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate')
+        self.send_header('Access-Control-Expose-Headers', 'Content-Range, Accept-Ranges, Content-Length, ETag, X-Cache, X-Frame-Time')
+        self.send_header('Cache-Control', self.cache_control)
         super().end_headers()
 
     def do_OPTIONS(self):
         self.send_response(200)
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
+    def do_GET(self):
+        if not self.dispatch_api('GET'):
+            super().do_GET()
+
+    def do_POST(self):
+        if not self.dispatch_api('POST'):
+            self.send_error(HTTPStatus.NOT_FOUND, 'No such endpoint')
+
+    def dispatch_api(self, method):
+        """Run the first api_routes handler whose method and path prefix match."""
+        path = urllib.parse.urlsplit(self.path).path
+        for route_method, prefix, name in self.api_routes:
+            if route_method == method and path.startswith(prefix):
+                self.route = prefix
+                getattr(self, name)(path[len(prefix):])
+                return True
+        return False
+
+    def handle_metrics(self, _):
+        snapshot = self.metrics.snapshot(self.metrics_extras())
+        if self.metrics_snapshots is not None:
+            self.metrics_snapshots.write(str(os.getpid()), snapshot)
+            snapshot = merge_snapshots(self.metrics_snapshots.read_all())
+        body = render_metrics(snapshot).encode('utf-8')
+        self.send_bytes(HTTPStatus.OK, body, 'text/plain; version=0.0.4; charset=utf-8')
+
+    @classmethod
+    def metrics_extras(cls):
+        """Cache, proxy and stream statistics exported next to request metrics."""
+        files, duplicate_bytes = cls.assets.duplicate_stats()
+        stats = cls.inference.stats
+        cameras = list(cls.cameras.cameras.values())
+        subscribers = [sub for camera in cameras for sub in list(camera.subscribers)]
+        ptz = [camera.stats for camera in list(cls.ptz.cameras.values())]
+        obs = [upstream for upstream in list(cls.obs.connections.values()) if not upstream.closed]
+        return [
+            ('playground_asset_duplicate_files', 'gauge', 'Files served from another path\'s blob.', files),
+            ('playground_asset_duplicate_bytes', 'gauge', 'Bytes not held twice thanks to dedupe.',
+             duplicate_bytes),
+            ('playground_compression_cache_bytes', 'gauge', 'Compressed variants held in memory.',
+             cls.compression.total_bytes),
+            ('playground_frame_cache_bytes', 'gauge', 'Decoded JPEG frames held in memory.',
+             cls.frames.total_bytes),
+            ('playground_proxy_cache_hits_total', 'counter', 'Inference requests served from cache.',
+             stats['hits']),
+            ('playground_proxy_cache_misses_total', 'counter', 'Inference requests sent upstream.',
+             stats['misses']),
+            ('playground_proxy_coalesced_total', 'counter', 'Inference requests merged into one in flight.',
+             stats['coalesced']),
+            ('playground_proxy_uncached_total', 'counter', 'Streaming inference requests passed through.',
+             stats['uncached']),
+            ('playground_open_streams', 'gauge', 'Long-lived responses served outside the worker pool.',
+             cls.streams.open),
+            ('playground_virtual_cameras', 'gauge', 'Virtual cameras currently decoding.', len(cameras)),
+            ('playground_stream_subscribers', 'gauge', 'Clients watching virtual cameras.', len(subscribers)),
+            ('playground_stream_frames_dropped_total', 'counter',
+             'Frames skipped for slow stream subscribers (current subscribers).',
+             sum(sub.dropped for sub in subscribers)),
+            ('playground_ptz_commands_total', 'counter', 'PTZ commands received from clients.',
+             sum(stats['received'] for stats in ptz)),
+            ('playground_ptz_coalesced_total', 'counter', 'PTZ move commands replaced by a newer one.',
+             sum(stats['coalesced'] for stats in ptz)),
+            ('playground_ptz_sent_total', 'counter', 'PTZ commands delivered to cameras.',
+             sum(stats['sent'] for stats in ptz)),
+            ('playground_ptz_errors_total', 'counter', 'PTZ commands that failed to reach a camera.',
+             sum(stats['errors'] for stats in ptz)),
+            ('playground_obs_connections', 'gauge', 'Upstream OBS WebSocket connections.', len(obs)),
+            ('playground_obs_clients', 'gauge', 'Clients sharing the OBS connections.',
+             sum(len(upstream.sessions) for upstream in obs)),
+            ('playground_obs_requests_total', 'counter', 'OBS requests from clients (open connections).',
+             sum(upstream.stats['requests'] for upstream in obs)),
+            ('playground_obs_cache_hits_total', 'counter', 'OBS reads answered from cache or an in-flight read.',
+             sum(upstream.stats['cache_hits'] for upstream in obs)),
+            ('playground_obs_batches_total', 'counter', 'RequestBatch messages sent to OBS.',
+             sum(upstream.stats['batches'] for upstream in obs)),
+            ('playground_obs_batched_writes_total', 'counter', 'Client writes sent inside those batches.',
+             sum(upstream.stats['batched_writes'] for upstream in obs)),
+            ('playground_bus_published_total', 'counter', 'Events published on the result bus.',
+             cls.bus.published),
+            ('playground_bus_subscribers', 'gauge', 'Result bus subscriptions (per topic).',
+             sum(len(subscribers) for subscribers in list(cls.bus.subscribers.values()))),
+            ('playground_bandwidth_chunks_total', 'counter', 'Body pieces sent under bandwidth caps.',
+             cls.bandwidth.stats['chunks']),
+            ('playground_bandwidth_wait_seconds_total', 'counter', 'Time connections waited for their turn.',
+             round(cls.bandwidth.stats['wait_seconds'], 6)),
+            ('playground_access_log_dropped_total', 'counter', 'Access log lines dropped under load.',
+             cls.access_log.dropped if cls.access_log else 0),
+        ]
+
+    def read_body(self):
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.close_connection = True
+            raise APIError(HTTPStatus.LENGTH_REQUIRED, 'Content-Length required')
+        if length < 0:
+            self.close_connection = True
+            raise APIError(HTTPStatus.BAD_REQUEST, 'Invalid Content-Length')
+        if length > MAX_REQUEST_BODY:
+            self.close_connection = True
+            raise APIError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'Request body too large')
+        return self.rfile.read(length)
+
+    def send_bytes(self, status, body, content_type='application/json', headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def send_json(self, status, obj, headers=()):
+        self.send_bytes(status, json.dumps(obj).encode('utf-8'), 'application/json', headers)
+
+    def handle_inference(self, endpoint):
+        """POST /v1/<endpoint> with a Moondream JSON body, a multipart form
+        with an `image` file field, or raw image bytes (Content-Type image/*)
+        with options in the query string and the prompt in X-Moondream-Prompt."""
+        try:
+            body = self.read_body()
+            headers = self.upstream_headers()
+            ctype = self.headers.get_content_type()
+            if ctype == 'multipart/form-data':
+                fields = parse_multipart(body, self.headers.get_param('boundary'))
+                if 'image' not in fields:
+                    raise APIError(HTTPStatus.BAD_REQUEST, 'Missing "image" field')
+                image_type, image = fields.pop('image')
+                try:
+                    options = {name: bytes(value).decode('utf-8') for name, (_, value) in fields.items()}
+                except UnicodeDecodeError:
+                    raise APIError(HTTPStatus.BAD_REQUEST, 'Form fields must be UTF-8 text')
+                response, cache_status = self.inference.handle_image(endpoint, image, image_type, options, headers)
+            elif ctype.startswith('image/'):
+                response, cache_status = self.inference.handle_image(
+                    endpoint, body, ctype, self.upload_options(endpoint), headers)
+            else:
+                response, cache_status = self.inference.handle(endpoint, body, headers)
+        except APIError as e:
+            self.send_json(e.status, {'error': str(e)})
+            return
+        except Exception:
+            # A client gets a JSON error rather than a dropped connection.
+            self.server.handle_error(self.request, self.client_address)
+            self.send_json(HTTPStatus.BAD_GATEWAY, {'error': 'Inference request failed'})
+            return
+        self.send_bytes(response.status, response.body, response.content_type,
+                        [('X-Cache', cache_status)])
+        topic = self.headers.get('X-Publish-Topic')
+        if topic and valid_topic(topic) and response.status == HTTPStatus.OK:
+            try:
+                result = json.loads(response.body)
+            except ValueError:
+                return
+            self.bus.publish(topic, json.dumps({'endpoint': endpoint, 'result': result}, separators=(',', ':')))
+
+    def handle_inference_socket(self, endpoint):
+        """GET /v1/<endpoint> as a WebSocket: each binary message is an image
+        and is answered with one text message holding the JSON result. Text
+        messages are JSON objects that replace the options (e.g. the
+        question) used for the images that follow."""
+        self.detach(self._serve_inference_socket, endpoint)
+
+    def _serve_inference_socket(self, endpoint):
+        options = self.upload_options(endpoint)
+        headers = self.upstream_headers()
+        ws = self.upgrade_websocket()
+        if ws is None:
+            return
+        while (message := ws.recv()) is not None:
+            if isinstance(message, str):
+                try:
+                    update = json.loads(message)
+                except ValueError:
+                    update = None
+                if isinstance(update, dict):
+                    options = update
+                else:
+                    ws.send(json.dumps({'error': 'Options must be a JSON object', 'status': 400}))
+                continue
+            try:
+                response, _ = self.inference.handle_image(
+                    endpoint, message, sniff_image_type(message), options, headers)
+            except APIError as e:
+                ws.send(json.dumps({'error': str(e), 'status': int(e.status)}))
+                continue
+            if response.status == HTTPStatus.OK:
+                ws.send(response.body.decode('utf-8'))
+            else:
+                ws.send(json.dumps({'error': response.body.decode('utf-8', 'replace'),
+                                    'status': response.status}))
+        ws.close()
+
+    def upstream_headers(self):
+        headers = {'Content-Type': 'application/json'}
+        if 'X-Moondream-Auth' in self.headers:
+            headers['X-Moondream-Auth'] = self.headers['X-Moondream-Auth']
+        return headers
+
+    def upload_options(self, endpoint):
+        """Options for a raw image upload: query parameters, plus the
+        X-Moondream-Prompt header as the endpoint's prompt field."""
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        options = {name: values[0] for name, values in query.items()}
+        prompt = self.headers.get('X-Moondream-Prompt')
+        if prompt and endpoint in PROMPT_FIELDS:
+            options[PROMPT_FIELDS[endpoint]] = urllib.parse.unquote(prompt)
+        return options
+
+    def handle_frame(self, video_path):
+        """GET /frames/<video>?t=SECONDS&w=WIDTH&h=HEIGHT&quality=1-100"""
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        path = self.translate_path('/' + video_path)
+        try:
+            t = float(query.get('t', ['0'])[0])
+            width = int(query['w'][0]) if 'w' in query else None
+            height = int(query['h'][0]) if 'h' in query else None
+            quality = int(query.get('quality', ['80'])[0])
+        except ValueError:
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': 't, w, h and quality must be numbers'})
+            return
+        if any(v is not None and not 0 < v <= MAX_FRAME_SIZE for v in (width, height)):
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': f'w and h must be 1-{MAX_FRAME_SIZE}'})
+            return
+        if not os.path.isfile(path):
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': 'Video not found'})
+            return
+        try:
+            asset = self.assets.lookup(path, os.stat(path))
+            jpeg, frame_time = self.frames.frame(path, asset, t, width, height, quality)
+        except APIError as e:
+            self.send_json(e.status, {'error': str(e)})
+            return
+        self.send_response(HTTPStatus.OK)
+        self.cache_control = f'public, max-age={self.media_max_age}, immutable'
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(jpeg)))
+        self.send_header('X-Frame-Time', f'{frame_time:.6f}')
+        self.end_headers()
+        self.wfile.write(jpeg)
+
+    def upgrade_websocket(self, protocols=()):
+        """Complete a WebSocket handshake and return the connection, or send
+        400 and return None."""
+        if self.headers.get('Upgrade', '').lower() != 'websocket' or not self.headers.get('Sec-WebSocket-Key'):
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': 'Expected a WebSocket upgrade'})
+            return None
+        return accept_websocket(self, protocols)
+
+    def handle_stream(self, video_path):
+        """GET /stream/<video>?w=WIDTH&fps=FPS&quality=1-100
+
+        A looping "virtual camera" of a sample video, decoded once on the
+        server and shared by every viewer. Served as MJPEG, or as one binary
+        WebSocket message per JPEG when the request is a WebSocket upgrade.
+        """
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        path = self.translate_path('/' + video_path)
+        try:
+            width = int(query['w'][0]) if 'w' in query else None
+            fps = int(query.get('fps', [str(DEFAULT_STREAM_FPS)])[0])
+            quality = int(query.get('quality', ['70'])[0])
+        except ValueError:
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': 'w, fps and quality must be numbers'})
+            return
+        if (width is not None and not 0 < width <= MAX_FRAME_SIZE) or not 0 < fps <= 60:
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': f'w must be 1-{MAX_FRAME_SIZE} and fps 1-60'})
+            return
+        if not os.path.isfile(path):
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': 'Video not found'})
+            return
+        self.detach(self._serve_stream, path, width, fps, quality)
+
+    def _serve_stream(self, path, width, fps, quality):
+        try:
+            asset = self.assets.lookup(path, os.stat(path))
+            camera, subscriber = self.cameras.subscribe(path, asset, width, fps, quality)
+        except APIError as e:
+            self.send_json(e.status, {'error': str(e)})
+            return
+        try:
+            if self.headers.get('Upgrade', '').lower() == 'websocket':
+                self._stream_websocket(subscriber)
+            else:
+                self._stream_mjpeg(subscriber)
+        except OSError:
+            pass
+        finally:
+            self.cameras.unsubscribe(camera, subscriber)
+
+    def _stream_mjpeg(self, subscriber):
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        while (frame := subscriber.next()) is not None:
+            self.wfile.write(b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: '
+                             + str(len(frame)).encode('ascii') + b'\r\n\r\n')
+            self.wfile.write(frame)
+            self.wfile.write(b'\r\n')
+
+    def _stream_websocket(self, subscriber):
+        ws = self.upgrade_websocket()
+        if ws is None:
+            return
+
+        def drain():
+            # Only control frames are expected; a close ends the stream.
+            while ws.recv() is not None:
+                pass
+            subscriber.close()
+
+        threading.Thread(target=drain, daemon=True).start()
+        while (frame := subscriber.next()) is not None:
+            ws.send(frame)
+        ws.close()
+
+    def handle_ptz(self, rest):
+        """GET /ptz/<camera>/<path>?<query>, e.g.
+        /ptz/192.168.1.50/cgi-bin/ptzctrl.cgi?ptzcmd&left&8&8
+
+        Move commands are answered 202 as soon as they are queued (a newer
+        move on the same axis may replace them); anything else waits for the
+        camera and relays its response.
+        """
+        name, _, path = rest.partition('/')
+        query = urllib.parse.urlsplit(self.path).query
+        try:
+            camera = self.ptz.camera(name, path)
+        except APIError as e:
+            self.send_json(e.status, {'error': str(e)})
+            return
+        headers = {'Authorization': self.headers['Authorization']} if 'Authorization' in self.headers else {}
+        axis = ptz_axis(path, query)
+        command = camera.submit(f'/{path}?{query}' if query else f'/{path}', headers, axis)
+        if axis is not None:
+            self.send_json(HTTPStatus.ACCEPTED, {'queued': axis})
+            return
+        response = command.wait(camera.timeout * 2)
+        if response is None:
+            self.send_json(HTTPStatus.GATEWAY_TIMEOUT, {'error': 'Camera did not answer in time'})
+            return
+        self.send_bytes(response.status, response.body, response.content_type)
+
+    def handle_obs(self, name):
+        """WebSocket /obs/<host:port>
+
+        Speaks obs-websocket v5 to the client and multiplexes it onto one
+        connection per OBS instance. Instead of OBS's challenge, the client
+        puts the password in its Identify message ({"op": 1, "d":
+        {"rpcVersion": 1, "password": ...}}) or an X-OBS-Password header,
+        and the hub uses it to authenticate the shared upstream connection.
+        """
+        if self.headers.get('Upgrade', '').lower() != 'websocket':
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': 'Expected a WebSocket upgrade'})
+            return
+        self.detach(self._serve_obs, name)
+
+    def _serve_obs(self, name):
+        ws = self.upgrade_websocket(('obswebsocket.json',))
+        if ws is None:
+            return
+        # The OBS version is not known until Identify names the password.
+        ws.send(json.dumps({'op': 0, 'd': {'obsWebSocketVersion': None, 'rpcVersion': 1}}))
+        upstream = None
+        try:
+            while (message := ws.recv()) is not None:
+                try:
+                    message = json.loads(message)
+                    op, d = message['op'], message.get('d') or {}
+                except (TypeError, ValueError, KeyError):
+                    continue
+                if op == 1 and upstream is None:
+                    password = d.get('password', self.headers.get('X-OBS-Password', ''))
+                    try:
+                        upstream = self.obs.connect(name, password if isinstance(password, str) else '')
+                    except APIError as e:
+                        # obs-websocket close codes: 4009 authentication failed, 4011 session invalidated
+                        ws.close(4009 if e.status == HTTPStatus.UNAUTHORIZED else 4011)
+                        break
+                    if not upstream.attach(ws):
+                        break
+                    ws.send(json.dumps({'op': 2, 'd': {'negotiatedRpcVersion': 1}}))
+                elif op == 3 and upstream is not None:
+                    ws.send(json.dumps({'op': 2, 'd': {'negotiatedRpcVersion': 1}}))
+                elif op == 6 and upstream is not None:
+                    upstream.request(ws, d)
+                elif op == 8 and upstream is not None:
+                    upstream.request_batch(ws, d)
+        finally:
+            if upstream is not None:
+                upstream.detach(ws)
+            ws.close()
+
+    def handle_bus_publish(self, topic):
+        """POST /bus/<topic> with a JSON body; answers {"id", "subscribers"}."""
+        if not valid_topic(topic):
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': 'Invalid topic'})
+            return
+        try:
+            data = bus_payload(self.read_body())
+        except APIError as e:
+            self.send_json(e.status, {'error': str(e)})
+            return
+        event, subscribers = self.bus.publish(topic, data)
+        self.send_json(HTTPStatus.OK, {'id': event.id, 'subscribers': subscribers})
+
+    def handle_bus_subscribe(self, topics):
+        """GET /bus/<topic>[,<topic>...]?replay=N
+
+        Server-sent events, or a WebSocket when the request is an upgrade;
+        JSON text sent on the WebSocket is published to the first topic.
+        Every event is {"id", "topic", "time", "data"}. The last N events of
+        each topic are sent first (default: all kept), or with Last-Event-ID
+        everything kept since that event.
+        """
+        names = topics.split(',')
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        if not all(valid_topic(name) for name in names):
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': 'Invalid topic'})
+            return
+        try:
+            replay = int(query['replay'][0]) if 'replay' in query else None
+            after = int(self.headers.get('Last-Event-ID') or 0)
+        except ValueError:
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': 'replay and Last-Event-ID must be numbers'})
+            return
+        self.detach(self._serve_bus, names, None if after else replay, after)
+
+    def _serve_bus(self, names, replay, after):
+        subscriber = self.bus.subscribe(names, replay, after)
+        try:
+            if self.headers.get('Upgrade', '').lower() == 'websocket':
+                self._bus_websocket(subscriber, names[0])
+            else:
+                self._bus_event_stream(subscriber)
+        finally:
+            self.bus.unsubscribe(subscriber)
+
+    def _bus_event_stream(self, subscriber):
+        self.send_response(HTTPStatus.OK)
+        self.cache_control = 'no-cache'
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        try:
+            self.wfile.write(b'retry: 2000\n\n')
+            while not subscriber.closed:
+                event = subscriber.next()
+                if event is None:
+                    self.wfile.write(b': keepalive\n\n')
+                else:
+                    self.wfile.write(f'id: {event.id}\ndata: {event.message}\n\n'.encode('utf-8'))
+        except OSError:
+            pass
+
+    def _bus_websocket(self, subscriber, topic):
+        ws = self.upgrade_websocket()
+        if ws is None:
+            return
+
+        def publish_incoming():
+            while (message := ws.recv()) is not None:
+                if isinstance(message, str):
+                    try:
+                        self.bus.publish(topic, bus_payload(message))
+                    except APIError as e:
+                        ws.send(json.dumps({'error': str(e)}))
+            subscriber.close()
+
+        threading.Thread(target=publish_incoming, daemon=True).start()
+        while not subscriber.closed:
+            event = subscriber.next()
+            if event is not None:
+                try:
+                    ws.send(event.message)
+                except OSError:
+                    break
+        ws.close()
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not urllib.parse.urlsplit(self.path).path.endswith('/'):
+                return super().send_head()
+            for index in ('index.html', 'index.htm'):
+                if os.path.isfile(os.path.join(path, index)):
+                    path = os.path.join(path, index)
+                    break
+            else:
+                return super().send_head()
+        if path.endswith('/') or not os.path.isfile(path):
+            return super().send_head()
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, 'File not found')
+            return None
+        try:
+            st = os.fstat(f.fileno())
+            asset = self.assets.lookup(path, st)
+            if asset.path != path:
+                f = self._open_canonical(f, asset)
+            return self.send_file_head(f, path, st, asset)
+        except Exception:
+            f.close()
+            raise
+
+    def _open_canonical(self, f, asset):
+        """Swap an alias for its canonical blob when that is still current."""
+        try:
+            canonical = open(asset.path, 'rb')
+        except OSError:
+            return f
+        st = os.fstat(canonical.fileno())
+        if (st.st_mtime_ns, st.st_size) != asset.stamp:
+            canonical.close()
+            return f
+        f.close()
+        return canonical
+
+    def send_file_head(self, f, path, st, asset):
+        """Send headers for a regular file, honouring conditional and Range
+        requests."""
+        ctype = self.guess_type(path)
+        size = st.st_size
+        etag = asset.etag
+        last_modified = self.date_time_string(st.st_mtime)
+        cache_control = self.cache_control_for(path)
+
+        # Compressed variants are whole-file only; range requests get identity.
+        varies = is_compressible(ctype) and size >= MIN_COMPRESS_SIZE
+        encoding = None
+        if varies and 'Range' not in self.headers:
+            encoding = negotiate_encoding(self.headers.get('Accept-Encoding', ''))
+        if encoding:
+            etag = f'{etag[:-1]}-{encoding}"'
+
+        if self.is_not_modified(etag, st.st_mtime):
+            f.close()
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.cache_control = cache_control
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            if varies:
+                self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return None
+
+        payload = self.compression.get(asset.digest, encoding, f, size) if encoding else None
+        if payload is not None:
+            f.close()
+            self.send_response(HTTPStatus.OK)
+            self.cache_control = cache_control
+            self.send_header('Content-Type', ctype)
+            self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            return FileBody(None, [payload])
+        if encoding:
+            etag = asset.etag
+
+        ranges = None
+        if 'Range' in self.headers and self.headers.get('If-Range', etag) in (etag, last_modified):
+            ranges = parse_range_header(self.headers['Range'], size)
+
+        if ranges == []:
+            f.close()
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+
+        mapping = lambda: self.assets.mapping(asset)
+        if not ranges:
+            body = FileBody(f, [(0, size)], mapping)
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', ctype)
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            body = FileBody(f, [(start, end - start + 1)], mapping)
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header('Content-Type', ctype)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            boundary = uuid.uuid4().hex
+            parts = []
+            for start, end in ranges:
+                parts.append((f'\r\n--{boundary}\r\n'
+                              f'Content-Type: {ctype}\r\n'
+                              f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode('latin-1'))
+                parts.append((start, end - start + 1))
+            parts.append(f'\r\n--{boundary}--\r\n'.encode('latin-1'))
+            body = FileBody(f, parts, mapping)
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header('Content-Type', f'multipart/byteranges; boundary={boundary}')
+
+        self.cache_control = cache_control
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        if varies:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        return body
+
+    def cache_control_for(self, path):
+        ext = os.path.splitext(path)[1].lower()
+        if self.cache_rules.get(ext) == 'immutable':
+            return f'public, max-age={self.media_max_age}, immutable'
+        return 'no-cache'
+
+    def is_not_modified(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError, IndexError, OverflowError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return int(mtime) <= since.timestamp()
+        return False
+
+    def copyfile(self, source, outputfile):
+        if isinstance(source, FileBody):
+            source.send(self)
+        else:
+            super().copyfile(source, outputfile)
+
+    def handle(self):
+        # The engine waits for the next request on this connection (or, for
+        # the single engine, closes it), so only serve what the client has
+        # already sent before handing it back.
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._has_pending_input():
+            self.handle_one_request()
+
+    def _has_pending_input(self):
+        try:
+            self.connection.setblocking(False)
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            try:
+                self.connection.settimeout(self.timeout)
+            except OSError:
+                pass
+
     extensions_map = {
         '.html': 'text/html',
         '.css': 'text/css',
@@ -39,16 +3200,551 @@ class CORSRequestHandler(SimpleHTTPRequestHandler):
         '.ico': 'image/x-icon',
         '': 'application/octet-stream',
     }
+    cache_rules = {ext: cache_rule(ctype) for ext, ctype in extensions_map.items()}
+
+
+# =============================================================================
+# Server Engines
+# =============================================================================
+
+class PlaygroundHTTPServer(HTTPServer):
+    request_queue_size = 128
+    engine = 'single'
+    reuse_port = False
+
+    def server_bind(self):
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def verify_request(self, request, client_address):
+        self.RequestHandlerClass.metrics.connection_opened()
+        return True
+
+    def shutdown_request(self, request):
+        self.RequestHandlerClass.metrics.connection_closed()
+        super().shutdown_request(request)
+
+    def handle_error(self, request, client_address):
+        # Clients routinely drop idle keep-alive connections; that is not a server error.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def finish_request(self, request, client_address):
+        return self.RequestHandlerClass(request, client_address, self)
+
+    def process_request(self, request, client_address):
+        if self.request_outcome(self.finish_request(request, client_address)) != 'detached':
+            self.shutdown_request(request)
+
+    @staticmethod
+    def request_outcome(handler):
+        """What to do with a connection once its handler returns: 'detached'
+        (a stream thread owns it now), 'keep-alive' (wait for the next
+        request) or 'close'."""
+        if handler.detached:
+            return 'detached'
+        return 'close' if handler.close_connection else 'keep-alive'
+
+
+class ThreadPoolHTTPServer(PlaygroundHTTPServer):
+    """Serves each request on a bounded pool of worker threads. Between
+    requests, idle keep-alive connections wait in a selector thread rather
+    than on a worker, so idle browser tabs do not pin the pool."""
+    engine = 'threads'
+    parks_idle_connections = True
+
+    def __init__(self, server_address, handler_class, max_workers=DEFAULT_THREADS,
+                 keepalive=DEFAULT_KEEPALIVE):
+        super().__init__(server_address, handler_class)
+        self.max_workers = max_workers
+        self.keepalive = keepalive
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='playground')
+        self._parking = []
+        self._parking_lock = threading.Lock()
+        self._waker = None
+        self._watching = False
+
+    def serve_forever(self, poll_interval=0.5):
+        # Started here rather than in __init__ so pre-forked workers get their own.
+        self._watching = True
+        waker, self._waker = socket.socketpair()
+        watcher = threading.Thread(target=self._watch_idle, args=(waker,), daemon=True,
+                                   name='playground-idle')
+        watcher.start()
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self._watching = False
+            self._wake_watcher()
+            watcher.join()
+            waker.close()
+            self._waker.close()
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        outcome = 'close'
+        try:
+            outcome = self.request_outcome(self.finish_request(request, client_address))
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            if outcome == 'keep-alive' and self._watching:
+                self._park(request, client_address)
+            elif outcome != 'detached':
+                self.shutdown_request(request)
+
+    def _park(self, conn, client_address):
+        with self._parking_lock:
+            self._parking.append((conn, client_address))
+        self._wake_watcher()
+
+    def _wake_watcher(self):
+        try:
+            self._waker.send(b'\0')
+        except OSError:
+            pass
+
+    def _watch_idle(self, waker):
+        """Wait on idle keep-alive connections; hand each back to the pool
+        when its next request arrives, close it after `keepalive` seconds."""
+        deadlines = {}
+        with selectors.DefaultSelector() as selector:
+            selector.register(waker, selectors.EVENT_READ)
+            while self._watching:
+                now = time.monotonic()
+                timeout = max(0, min(deadlines.values()) - now) if deadlines else None
+                for key, _ in selector.select(timeout):
+                    if key.fileobj is waker:
+                        waker.recv(4096)
+                        continue
+                    selector.unregister(key.fileobj)
+                    del deadlines[key.fileobj]
+                    self.executor.submit(self._process_request_worker, key.fileobj, key.data)
+                with self._parking_lock:
+                    parked, self._parking = self._parking, []
+                now = time.monotonic()
+                for conn, client_address in parked:
+                    try:
+                        selector.register(conn, selectors.EVENT_READ, client_address)
+                    except (OSError, ValueError):
+                        self.shutdown_request(conn)
+                        continue
+                    deadlines[conn] = now + self.keepalive
+                for conn in [conn for conn, deadline in deadlines.items() if deadline <= now]:
+                    selector.unregister(conn)
+                    del deadlines[conn]
+                    self.shutdown_request(conn)
+            for conn in deadlines:
+                self.shutdown_request(conn)
+        with self._parking_lock:
+            parked, self._parking = self._parking, []
+        for conn, _ in parked:
+            self.shutdown_request(conn)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncioHTTPServer(PlaygroundHTTPServer):
+    """Accepts connections and waits on idle keep-alive sockets in an asyncio
+    event loop, dispatching each ready request to a bounded worker pool."""
+    engine = 'asyncio'
+    parks_idle_connections = True
+
+    def __init__(self, server_address, handler_class, max_workers=DEFAULT_THREADS,
+                 keepalive=DEFAULT_KEEPALIVE):
+        super().__init__(server_address, handler_class)
+        self.max_workers = max_workers
+        self.keepalive = keepalive
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='playground')
+        self._loop = None
+        self._stopped = None
+        self._finished = threading.Event()
+        self._idle = {}
+
+    def serve_forever(self, poll_interval=None):
+        self._finished.clear()
+        try:
+            asyncio.run(self._serve())
+        finally:
+            self._finished.set()
+
+    def shutdown(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+            self._finished.wait()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self.socket.setblocking(False)
+        self._loop.add_reader(self.socket.fileno(), self._accept)
+        try:
+            await self._stopped.wait()
+        finally:
+            self._loop.remove_reader(self.socket.fileno())
+            for conn in list(self._idle):
+                self._close_idle(conn)
+
+    def _accept(self):
+        while True:
+            try:
+                conn, client_address = self.socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            conn.setblocking(True)
+            self.RequestHandlerClass.metrics.connection_opened()
+            self._dispatch(conn, client_address)
+
+    def _park(self, conn, client_address):
+        try:
+            fd = conn.fileno()
+        except OSError:
+            return
+        if fd < 0:
+            return
+        timer = self._loop.call_later(self.keepalive, self._close_idle, conn)
+        self._idle[conn] = (fd, timer)
+        self._loop.add_reader(fd, self._wake, conn, client_address)
+
+    def _wake(self, conn, client_address):
+        self._forget(conn)
+        self._dispatch(conn, client_address)
+
+    def _forget(self, conn):
+        fd, timer = self._idle.pop(conn, (None, None))
+        if fd is not None:
+            timer.cancel()
+            self._loop.remove_reader(fd)
+
+    def _close_idle(self, conn):
+        self._forget(conn)
+        self.shutdown_request(conn)
+
+    def _dispatch(self, conn, client_address):
+        future = self._loop.run_in_executor(
+            self.executor, self._serve_ready_request, conn, client_address)
+        future.add_done_callback(
+            lambda f: self._after_request(f, conn, client_address))
+
+    def _serve_ready_request(self, conn, client_address):
+        try:
+            return self.request_outcome(self.finish_request(conn, client_address))
+        except Exception:
+            self.handle_error(conn, client_address)
+            return 'close'
+
+    def _after_request(self, future, conn, client_address):
+        outcome = 'close' if future.cancelled() or future.exception() else future.result()
+        if outcome == 'keep-alive' and not self._stopped.is_set():
+            self._park(conn, client_address)
+        elif outcome != 'detached':
+            self.shutdown_request(conn)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def make_server(host, port, engine='threads', threads=DEFAULT_THREADS,
+                keepalive=DEFAULT_KEEPALIVE, handler_class=CORSRequestHandler, access_log=None):
+    handler_class.timeout = keepalive
+    handler_class.access_log = access_log
+    address = (host, port)
+    if engine == 'asyncio':
+        return AsyncioHTTPServer(address, handler_class, threads, keepalive)
+    if engine == 'threads':
+        return ThreadPoolHTTPServer(address, handler_class, threads, keepalive)
+    return PlaygroundHTTPServer(address, handler_class)
+
+
+# =============================================================================
+# Pre-fork Workers
+# =============================================================================
+
+class MetricsSnapshots:
+    """Per-process metrics snapshots, one JSON file per worker in a shared
+    directory, so whichever worker answers /metrics can report for all."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, name, snapshot):
+        path = os.path.join(self.directory, f'{name}.json')
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+
+    def read_all(self):
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                pass
+        return snapshots
+
+    def remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, f'{name}.json'))
+        except OSError:
+            pass
+
+    def publish(self, name, snapshot, interval=METRICS_SNAPSHOT_INTERVAL):
+        """Rewrite `name`'s snapshot from snapshot() every `interval` seconds."""
+        def run():
+            while True:
+                try:
+                    self.write(name, snapshot())
+                except OSError:
+                    pass
+                time.sleep(interval)
+        threading.Thread(target=run, name='metrics-snapshot', daemon=True).start()
+
+
+class WorkerSupervisor:
+    """Forks `workers` processes that each run serve(slot), and restarts any
+    worker that exits until Ctrl+C or SIGTERM stops them all."""
+
+    def __init__(self, workers, serve, snapshots):
+        self.workers = workers
+        self.serve = serve
+        self.snapshots = snapshots
+        self.children = {}
+        self.restarts = 0
+        self.stopping = False
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        for slot in range(self.workers):
+            self._spawn(slot)
+        self._publish()
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            slot, started = self.children.pop(pid, (None, 0))
+            self.snapshots.remove(str(pid))
+            self._publish()
+            if slot is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            reason = f'signal {-code}' if code < 0 else f'exit code {code}'
+            print(f'  Worker {pid} stopped ({reason}), restarting', file=sys.stderr)
+            if time.monotonic() - started < WORKER_MIN_UPTIME:
+                time.sleep(WORKER_RESTART_DELAY)
+            if not self.stopping:
+                self.restarts += 1
+                self._spawn(slot)
+                self._publish()
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                self.serve(slot)
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.children[pid] = (slot, time.monotonic())
+
+    def _publish(self):
+        self.snapshots.write('supervisor', {'scalars': [
+            ['playground_workers', 'gauge', 'Worker processes running.', len(self.children)],
+            ['playground_worker_restarts_total', 'counter', 'Worker processes restarted after exiting.',
+             self.restarts],
+        ]})
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Visual Reasoning Playground dev server')
+    parser.add_argument('port', nargs='?', type=int, default=8000)
+    parser.add_argument('--bind', default='localhost',
+                        help='interface to listen on (default: localhost)')
+    parser.add_argument('--engine', choices=['threads', 'asyncio', 'single'], default='threads',
+                        help='concurrency engine (default: threads)')
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS,
+                        help=f'maximum concurrent worker threads (default: {DEFAULT_THREADS})')
+    parser.add_argument('--max-streams', type=int, default=DEFAULT_MAX_STREAMS,
+                        help='open MJPEG, event-stream and WebSocket connections allowed, each on its own '
+                             f'thread outside --threads (default: {DEFAULT_MAX_STREAMS})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='pre-fork this many server processes on the same port (default: 1)')
+    parser.add_argument('--media-max-age', type=int, default=DEFAULT_MEDIA_MAX_AGE,
+                        help=f'seconds browsers may cache video and images (default: {DEFAULT_MEDIA_MAX_AGE})')
+    parser.add_argument('--compress-cache-mb', type=int, default=DEFAULT_COMPRESS_CACHE_MB,
+                        help=f'memory budget for gzip/brotli variants (default: {DEFAULT_COMPRESS_CACHE_MB})')
+    parser.add_argument('--max-bandwidth', type=float, default=0,
+                        help='cap on total file-serving bandwidth in MB/s, shared fairly (default: no cap)')
+    parser.add_argument('--client-bandwidth', type=float, default=0,
+                        help='cap per client address in MB/s (default: no cap)')
+    parser.add_argument('--precompress', action='store_true',
+                        help='compress text assets at startup instead of on first request')
+    parser.add_argument('--upstream', default=DEFAULT_UPSTREAM,
+                        help='inference API behind /v1/*, or "stub" for the offline stub backend '
+                             f'(default: {DEFAULT_UPSTREAM})')
+    parser.add_argument('--stub-delay', type=float, default=0.0,
+                        help='simulated inference latency for --upstream stub, in seconds')
+    parser.add_argument('--proxy-cache-entries', type=int, default=DEFAULT_PROXY_CACHE_ENTRIES,
+                        help=f'inference results kept in memory (default: {DEFAULT_PROXY_CACHE_ENTRIES})')
+    parser.add_argument('--proxy-cache-dir',
+                        help='also persist inference results to this directory')
+    parser.add_argument('--frame-index-dir', default=DEFAULT_FRAME_INDEX_DIR,
+                        help='where per-video keyframe indexes are persisted')
+    parser.add_argument('--frame-cache-mb', type=int, default=DEFAULT_FRAME_CACHE_MB,
+                        help=f'memory budget for decoded JPEG frames (default: {DEFAULT_FRAME_CACHE_MB})')
+    parser.add_argument('--ptz-rate', type=float, default=DEFAULT_PTZ_RATE,
+                        help='maximum commands per second sent to each PTZ camera, per worker process '
+                             f'(default: {DEFAULT_PTZ_RATE})')
+    parser.add_argument('--ptz-camera', action='append', default=[], metavar='HOST',
+                        help='allow /ptz/ to reach this camera host or host:port even if it is not a private '
+                             'LAN address (repeatable)')
+    parser.add_argument('--fake-ptz', action='store_true',
+                        help='start a simulated PTZOptics camera, reachable as /ptz/fake/...')
+    parser.add_argument('--obs-host', action='append', default=[], metavar='HOST',
+                        help='allow /obs/ to reach this OBS host or host:port even if it is not a private '
+                             'LAN address or OBS\'s default port on this machine (repeatable)')
+    parser.add_argument('--fake-obs', action='store_true',
+                        help='start a simulated OBS WebSocket server, reachable as /obs/fake')
+    parser.add_argument('--bus-replay', type=int, default=DEFAULT_BUS_REPLAY,
+                        help=f'results kept per result-bus topic for late subscribers (default: {DEFAULT_BUS_REPLAY})')
+    parser.add_argument('--access-log', default='stderr',
+                        help='"stderr", "off", or a file path for the buffered access log (default: stderr)')
+    parser.add_argument('--keepalive', type=float, default=DEFAULT_KEEPALIVE,
+                        help=f'idle keep-alive timeout in seconds (default: {DEFAULT_KEEPALIVE})')
+    return parser.parse_args(argv)
+
 
 if __name__ == '__main__':
-    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
-    server = HTTPServer(('localhost', port), CORSRequestHandler)
+    args = parse_args()
+    port = args.port
+    CORSRequestHandler.media_max_age = args.media_max_age
+    CORSRequestHandler.compression = CompressionCache(args.compress_cache_mb * 1024 * 1024)
+    CORSRequestHandler.bandwidth = BandwidthScheduler(args.max_bandwidth * 1024 * 1024,
+                                                      args.client_bandwidth * 1024 * 1024)
+    upstream = StubUpstream(args.stub_delay) if args.upstream == 'stub' else HTTPUpstream(args.upstream)
+    CORSRequestHandler.inference = InferenceProxy(
+        upstream, ResultCache(args.proxy_cache_entries, args.proxy_cache_dir))
+    if args.access_log == 'off':
+        access_log = None
+    elif args.access_log == 'stderr':
+        access_log = AccessLog()
+    else:
+        access_log = AccessLog(open(args.access_log, 'a', buffering=1))
+    CORSRequestHandler.frames = FrameExtractor(args.frame_index_dir, args.frame_cache_mb * 1024 * 1024)
+    CORSRequestHandler.ptz = PTZHub(args.ptz_rate, args.ptz_camera)
+    CORSRequestHandler.obs = OBSHub(args.obs_host)
+    CORSRequestHandler.bus = ResultBus(args.bus_replay)
+    CORSRequestHandler.streams = StreamSlots(args.max_streams)
+    if args.fake_ptz:
+        CORSRequestHandler.ptz.aliases['fake'] = FakePTZCamera().start().address
+    if args.fake_obs:
+        CORSRequestHandler.obs.aliases['fake'] = FakeOBS().start().address
+    if args.workers > 1 and not hasattr(os, 'fork'):
+        sys.exit('--workers needs os.fork(), which this platform does not provide')
+    # Linux balances connections across SO_REUSEPORT sockets; elsewhere the
+    # workers share one inherited listening socket instead.
+    reuse_port = args.workers > 1 and sys.platform.startswith('linux') and hasattr(socket, 'SO_REUSEPORT')
+    PlaygroundHTTPServer.reuse_port = reuse_port
+    server = make_server(args.bind, port, args.engine, args.threads, args.keepalive, access_log=access_log)
+    if reuse_port:
+        # The bind above only checks the port is free; an idle listener here
+        # would be handed connections nobody accepts.
+        server.server_close()
     print(f'\n  Visual Reasoning Playground')
     print(f'  ===========================')
-    print(f'  Server running at: http://localhost:{port}')
-    print(f'  CORS enabled for sample video support\n')
-    print(f'  Press Ctrl+C to stop\n')
-    try:
-        server.serve_forever()
-    except KeyboardInterrupt:
-        print('\nServer stopped.')
+    print(f'  Server running at: http://{args.bind}:{port}')
+    print(f'  CORS enabled for sample video support')
+    print(f'  Inference proxy: http://{args.bind}:{port}/v1/* -> {args.upstream}')
+    print(f'  Metrics: http://{args.bind}:{port}/metrics')
+    print(f'  PTZ proxy: http://{args.bind}:{port}/ptz/<camera-ip>/cgi-bin/ptzctrl.cgi?... '
+          f'({args.ptz_rate:g} commands/s per camera)')
+    if args.fake_ptz:
+        print(f'  Simulated PTZ camera: /ptz/fake/... (position at /ptz/fake/status)')
+    print(f'  Result bus: http://{args.bind}:{port}/bus/<topic> (POST to publish; SSE or WebSocket to subscribe)')
+    print(f'  OBS hub: ws://{args.bind}:{port}/obs/<obs-host:port> (one shared OBS connection)')
+    if args.fake_obs:
+        print(f'  Simulated OBS: ws://{args.bind}:{port}/obs/fake')
+    if FFMPEG and FFPROBE:
+        print(f'  Video frames: http://{args.bind}:{port}/frames/<video>?t=SECONDS&w=WIDTH')
+    if FFMPEG:
+        print(f'  Virtual cameras: http://{args.bind}:{port}/stream/<video>?w=WIDTH&fps=FPS (MJPEG or WebSocket)')
+    else:
+        print(f'  Video frames and virtual cameras: disabled (install ffmpeg to enable)')
+    if server.engine == 'single':
+        print(f'  Engine: single (one request at a time)')
+    else:
+        print(f'  Engine: {server.engine} ({args.threads} threads, HTTP/1.1 keep-alive)')
+    if args.max_bandwidth or args.client_bandwidth:
+        print(f'  Bandwidth: {args.max_bandwidth or "no"} MB/s total, {args.client_bandwidth or "no"} MB/s '
+              f'per client cap (fair-queued in {FAIR_CHUNK // 1024} KB chunks)')
+    if args.workers > 1:
+        print(f'  Workers: {args.workers} processes '
+              f'({"SO_REUSEPORT" if reuse_port else "shared listening socket"}, restarted if they exit)')
+    CORSRequestHandler.assets.scan(os.getcwd())
+    alias_files, alias_bytes = CORSRequestHandler.assets.duplicate_stats()
+    print(f'  Asset index: {len(CORSRequestHandler.assets.files())} files, '
+          f'{alias_files} duplicates ({alias_bytes / 1048576:.1f} MB served from shared blobs)')
+    if args.precompress:
+        CORSRequestHandler.compression.warm(CORSRequestHandler.assets, CORSRequestHandler.extensions_map)
+        print(f'  Precompressed text assets: {CORSRequestHandler.compression.total_bytes / 1048576:.1f} MB cached')
+    print(f'\n  Press Ctrl+C to stop\n')
+    if args.workers > 1:
+        snapshots = MetricsSnapshots(tempfile.mkdtemp(prefix='playground-metrics-'))
+        CORSRequestHandler.metrics_snapshots = snapshots
+
+        def serve_worker(slot):
+            # Threads do not survive fork(): restart the access log writer.
+            if access_log is not None:
+                CORSRequestHandler.access_log = AccessLog(access_log.stream)
+            worker = server
+            if reuse_port:
+                worker = make_server(args.bind, port, args.engine, args.threads, args.keepalive,
+                                     access_log=CORSRequestHandler.access_log)
+            snapshots.publish(str(os.getpid()), lambda: CORSRequestHandler.metrics.snapshot(
+                CORSRequestHandler.metrics_extras()))
+            worker.serve_forever()
+
+        try:
+            WorkerSupervisor(args.workers, serve_worker, snapshots).run()
+            print('\nServer stopped.')
+        finally:
+            if not reuse_port:
+                server.server_close()
+            shutil.rmtree(snapshots.directory, ignore_errors=True)
+    else:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print('\nServer stopped.')
+        finally:
+            server.server_close()
@@ -14,6 +14,8 @@ class MoondreamClient {
         this.apiKey = apiKey;
         this.baseUrl = 'https://api.moondream.ai/v1';
         this.timeout = 30000; // 30 second timeout
+        this.binaryUploads = false;
+        this.publishTopic = null;
     }
 
     /**
@@ -24,6 +26,19 @@ class MoondreamClient {
         this.apiKey = apiKey;
     }
 
+    /**
+     * Point the client at a different Moondream-compatible API,
+     * e.g. '/v1' to use the caching proxy in server.py
+     * @param {string} baseUrl - Base URL including the /v1 prefix
+     * @param {Object} options - Optional parameters
+     * @param {boolean} options.binaryUploads - Send video frames as raw JPEG
+     *   (multipart) instead of base64 JSON; server.py supports this
+     */
+    setBaseUrl(baseUrl, options = {}) {
+        this.baseUrl = baseUrl.replace(/\/+$/, '');
+        this.binaryUploads = !!options.binaryUploads;
+    }
+
     captureFrame(video, quality = 0.8) {
         const canvas = document.createElement('canvas');
         canvas.width = video.videoWidth;
@@ -43,7 +58,44 @@ class MoondreamClient {
     }
 
     /**
-     * Make an API request to Moondream
+     * Have the server.py proxy publish every result of this client on the
+     * result bus, so other tools can subscribe instead of calling the API
+     * @param {string|null} topic - e.g. 'cam1/gesture', or null to stop
+     */
+    setPublishTopic(topic) {
+        this.publishTopic = topic || null;
+    }
+
+    /**
+     * Capture a frame as a JPEG Blob, for binary uploads
+     * @param {HTMLVideoElement} video - The video element
+     * @returns {Promise<Blob>}
+     */
+    captureFrameBlob(video, quality = 0.8) {
+        const canvas = document.createElement('canvas');
+        canvas.width = video.videoWidth;
+        canvas.height = video.videoHeight;
+        canvas.getContext('2d').drawImage(video, 0, 0, canvas.width, canvas.height);
+
+        return new Promise((resolve, reject) => {
+            try {
+                canvas.toBlob(blob => blob ? resolve(blob) : reject(new Error('Frame capture failed')),
+                    'image/jpeg', quality);
+            } catch (e) {
+                reject(e.name === 'SecurityError'
+                    ? new Error('Cannot capture frame from sample video. Please switch to Live Camera mode to use AI detection, or run a CORS-enabled server.')
+                    : e);
+            }
+        });
+    }
+
+    async _captureForUpload(video) {
+        return this.binaryUploads ? this.captureFrameBlob(video) : this.captureFrame(video);
+    }
+
+    /**
+     * Make an API request to Moondream. An image_url given as a Blob is
+     * sent as multipart form data instead of JSON.
      * @private
      */
     async _request(endpoint, body) {
@@ -54,14 +106,29 @@ class MoondreamClient {
         const controller = new AbortController();
         const timeoutId = setTimeout(() => controller.abort(), this.timeout);
 
+        const headers = { 'X-Moondream-Auth': this.apiKey };
+        if (this.publishTopic) {
+            headers['X-Publish-Topic'] = this.publishTopic;
+        }
+        let payload;
+        if (body.image_url instanceof Blob) {
+            payload = new FormData();
+            payload.append('image', body.image_url, 'frame.jpg');
+            for (const [name, value] of Object.entries(body)) {
+                if (name !== 'image_url' && name !== 'stream') {
+                    payload.append(name, value);
+                }
+            }
+        } else {
+            headers['Content-Type'] = 'application/json';
+            payload = JSON.stringify(body);
+        }
+
         try {
             const response = await fetch(`${this.baseUrl}${endpoint}`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-Moondream-Auth': this.apiKey
-                },
-                body: JSON.stringify(body),
+                headers: headers,
+                body: payload,
                 signal: controller.signal
             });
 
@@ -89,7 +156,7 @@ class MoondreamClient {
 
     /**
      * Generate a caption/description for an image
-     * @param {string} imageDataUrl - Base64 image data URL
+     * @param {string|Blob} imageDataUrl - Base64 image data URL, or a JPEG Blob (see setBaseUrl)
      * @param {Object} options - Optional parameters
      * @param {string} options.length - Caption length: 'short', 'normal', or 'long' (default: 'normal')
      * @returns {Promise<{description: string}>}
@@ -109,7 +176,7 @@ class MoondreamClient {
 
     /**
      * Detect objects in an image
-     * @param {string} imageDataUrl - Base64 image data URL
+     * @param {string|Blob} imageDataUrl - Base64 image data URL, or a JPEG Blob (see setBaseUrl)
      * @param {string} objectDescription - What to detect (e.g., "person", "red ball")
      * @returns {Promise<{objects: Array}>} Array of detections with normalized coordinates
      */
@@ -143,7 +210,7 @@ class MoondreamClient {
 
     /**
      * Ask a question about an image
-     * @param {string} imageDataUrl - Base64 image data URL
+     * @param {string|Blob} imageDataUrl - Base64 image data URL, or a JPEG Blob (see setBaseUrl)
      * @param {string} question - Question to ask about the image
      * @returns {Promise<{answer: string}>}
      */
@@ -166,7 +233,7 @@ class MoondreamClient {
 
     /**
      * Point to a described location in an image
-     * @param {string} imageDataUrl - Base64 image data URL
+     * @param {string|Blob} imageDataUrl - Base64 image data URL, or a JPEG Blob (see setBaseUrl)
      * @param {string} description - Description of what to point to
      * @returns {Promise<{x: number, y: number}>} Normalized coordinates
      */
@@ -195,7 +262,7 @@ class MoondreamClient {
      * @returns {Promise<{objects: Array}>}
      */
     async detectInVideo(video, objectDescription) {
-        const frame = this.captureFrame(video);
+        const frame = await this._captureForUpload(video);
         return this.detect(frame, objectDescription);
     }
 
@@ -206,7 +273,7 @@ class MoondreamClient {
      * @returns {Promise<{description: string}>}
      */
     async describeVideo(video, options = {}) {
-        const frame = this.captureFrame(video);
+        const frame = await this._captureForUpload(video);
         return this.describe(frame, options);
     }
 
@@ -217,7 +284,7 @@ class MoondreamClient {
      * @returns {Promise<{answer: string}>}
      */
     async askVideo(video, question) {
-        const frame = this.captureFrame(video);
+        const frame = await this._captureForUpload(video);
         return this.ask(frame, question);
     }
 }
@@ -0,0 +1,58 @@
+/**
+ * Result Bus Client - share detection results between tools
+ * Part of the Visual Reasoning Playground
+ *
+ * Talks to the /bus endpoints of server.py. One tool (the producer) runs
+ * detection for a camera and publishes results; any number of tools
+ * subscribe to the topic instead of calling the vision API themselves.
+ *
+ *   const bus = new ResultBus();
+ *   client.setPublishTopic('cam1/gesture');   // producer: publish via the proxy
+ *   bus.subscribe('cam1/gesture', event => console.log(event.data));
+ */
+
+class ResultBus {
+    constructor(baseUrl = '/bus') {
+        this.baseUrl = baseUrl.replace(/\/+$/, '');
+    }
+
+    /**
+     * Publish a result on a topic
+     * @param {string} topic - e.g. 'cam1/detect'
+     * @param {*} data - Any JSON-serialisable value
+     * @returns {Promise<{id: number, subscribers: number}>}
+     */
+    async publish(topic, data) {
+        const response = await fetch(`${this.baseUrl}/${topic}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(data)
+        });
+        if (!response.ok) {
+            throw new Error(`Publish failed (${response.status}): ${await response.text()}`);
+        }
+        return response.json();
+    }
+
+    /**
+     * Subscribe to one or more topics with server-sent events. The last
+     * results of each topic are delivered first, and the browser resumes
+     * where it left off after a reconnect.
+     * @param {string|string[]} topics - Topic name(s)
+     * @param {Function} onEvent - Called with {id, topic, time, data}
+     * @param {Object} options - Optional parameters
+     * @param {number} options.replay - How many past results per topic to receive first
+     * @returns {Function} Call to unsubscribe
+     */
+    subscribe(topics, onEvent, options = {}) {
+        const names = Array.isArray(topics) ? topics.join(',') : topics;
+        const query = options.replay !== undefined ? `?replay=${options.replay}` : '';
+        const source = new EventSource(`${this.baseUrl}/${names}${query}`);
+        source.onmessage = (message) => onEvent(JSON.parse(message.data));
+        return () => source.close();
+    }
+}
+
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = ResultBus;
+}